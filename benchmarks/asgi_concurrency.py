@@ -0,0 +1,89 @@
+"""
+Side by side concurrency benchmark of the WSGI and ASGI deployments.
+
+Start both servers against the same database, for example:
+
+    gunicorn -b :8000 --workers 1 --threads 4 portal.wsgi
+    PORTAL_ASGI=1 uvicorn --port 8001 --workers 1 portal.asgi:application
+
+then run:
+
+    python benchmarks/asgi_concurrency.py --token <access token> \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001
+
+Every target gets the same read mix (drug and vaccination list and detail) at
+each concurrency level. Only the standard library is used so the script can
+run from any machine that can reach the servers.
+"""
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+READ_PATHS = ('/api/drugs', '/api/drugs/{drug_id}', '/api/vaccinations', '/api/vaccinations/{vaccination_id}')
+
+
+def fetch(url, token, timeout):
+    request = urllib.request.Request(url, headers={'Authorization': 'Bearer %s' % token})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            code = response.status
+    except urllib.error.HTTPError as exc:
+        code = exc.code
+    except (urllib.error.URLError, OSError):
+        code = None
+    return code, time.perf_counter() - started
+
+
+def run(base_url, paths, token, concurrency, requests, timeout):
+    urls = [base_url + paths[i % len(paths)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, token, timeout), urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for code, latency in results if code == 200)
+    errors = sum(1 for code, _ in results if code != 200)
+    if not latencies:
+        return {'rps': 0.0, 'p50': None, 'p99': None, 'errors': errors}
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='server to benchmark, may be given several times')
+    parser.add_argument('--token', required=True, help='JWT access token')
+    parser.add_argument('--drug-id', type=int, default=1, help='drug used for the detail reads')
+    parser.add_argument('--vaccination-id', type=int, default=1, help='vaccination used for the detail reads')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--requests', type=int, default=400, help='requests per concurrency level')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.target]
+    paths = [path.format(drug_id=args.drug_id, vaccination_id=args.vaccination_id) for path in READ_PATHS]
+    print('%-8s %11s %10s %10s %10s %7s' % ('target', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    for name, base_url in targets:
+        base_url = base_url.rstrip('/')
+        for concurrency in args.concurrency:
+            result = run(base_url, paths, args.token, concurrency, args.requests, args.timeout)
+            print('%-8s %11d %10.1f %10s %10s %7d' % (
+                name, concurrency, result['rps'],
+                '-' if result['p50'] is None else '%.1f' % result['p50'],
+                '-' if result['p99'] is None else '%.1f' % result['p99'],
+                result['errors'],
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Latency of drug type-ahead searches against the in-memory index, and of
+re-indexing after a catalog reload where a few drugs changed.
+
+Builds catalogs of `--drugs` synthetic drugs (nothing is written to the
+database) and runs every prefix of a set of names and codes as a query, the
+way a user typing them would:
+
+    python benchmarks/drug_search.py --drugs 100 1000 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portal.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from drugs.models import Drug  # noqa: E402
+from drugs.search import DrugSearchIndex  # noqa: E402
+
+WORDS = ['vacuna', 'pfizer', 'biontech', 'sinovac', 'coronavac', 'astrazeneca', 'moderna', 'janssen', 'cansino',
+         'sputnik', 'influenza', 'hepatitis', 'pediátrica', 'adulto', 'refuerzo', 'tétanos', 'neumocócica']
+
+
+def catalog(rng, size):
+    return [
+        Drug(id=n, code=''.join(rng.choices(string.ascii_lowercase, k=3)) + str(n),
+             name=' '.join(rng.sample(WORDS, rng.randrange(1, 4))).capitalize(), description='')
+        for n in range(1, size + 1)
+    ]
+
+
+def typed(text):
+    return [text[:length] for length in range(1, len(text) + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drugs', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--queries', type=int, default=50, help="Names and codes typed per catalog.")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'drugs':>6}  {'build ms':>9}  {'reindex ms':>10}  {'p50 us':>7}  {'p99 us':>7}  {'max us':>7}")
+    for size in args.drugs:
+        drugs = catalog(rng, size)
+        index = DrugSearchIndex()
+        started = time.perf_counter()
+        index.update(drugs)
+        build = time.perf_counter() - started
+
+        for drug in rng.sample(drugs, min(10, size)):
+            drug.name += ' nueva'
+        started = time.perf_counter()
+        index.update(drugs)
+        reindex = time.perf_counter() - started
+
+        queries = []
+        for drug in rng.sample(drugs, min(args.queries, size)):
+            queries.extend(typed(drug.code))
+            queries.extend(typed(drug.name.split()[-1]))
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, args.limit)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        print(f"{size:>6}  {build * 1000:>9.1f}  {reindex * 1000:>10.2f}  "
+              f"{statistics.median(latencies) * 1e6:>7.0f}  {latencies[int(len(latencies) * 0.99) - 1] * 1e6:>7.0f}  "
+              f"{latencies[-1] * 1e6:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
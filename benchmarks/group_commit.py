@@ -0,0 +1,190 @@
+"""
+Write throughput of single vaccination creates, one INSERT and commit per
+create against group commit, at several concurrency levels.
+
+Each of `concurrency` threads creates `--creates` vaccinations the way
+`VaccinationListCreateAPIView` does after validation, on its own connection to
+the configured database (run `python manage.py migrate` first). The rows are
+written for a drug created for the run and deleted afterwards.
+
+The asgi modes run `concurrency` coroutines instead, each write going through
+`sync_to_async(thread_sensitive=True)` like writes served by `portal.asgi`:
+every write shares one thread, so a group commit leader waits `max_delay` for
+followers that cannot arrive, which is why the view writes directly there.
+
+With `--drug-edits`, one more thread keeps renaming the run's drug while the
+creates run, and the drug column shows the median latency of those edits: how
+long drug writes wait behind vaccination writes.
+
+    PORTAL_LOCAL=1 python benchmarks/group_commit.py --concurrency 1 8 32 --creates 200 --drug-edits
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portal.settings')
+
+import django  # noqa: E402
+from asgiref.sync import sync_to_async  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from drugs.cache import drug_cache  # noqa: E402
+from drugs.models import Drug  # noqa: E402
+from portal.group_commit import GroupCommitter  # noqa: E402
+from portal.versions import bump_version  # noqa: E402
+from vaccinations.models import Vaccination, VaccinationDailyStat  # noqa: E402
+from vaccinations.rut import compute_verification_digit  # noqa: E402
+
+DRUG_CODE = 'BENCHGC'
+
+
+def vaccination(rng, drug):
+    number = rng.randrange(1000000, 26000000)
+    return Vaccination(rut_number=number, rut_dv=compute_verification_digit(number),
+                       dose='%.2f' % (rng.randrange(15, 101) / 100), drug=drug)
+
+
+def run(mode, concurrency, creates, drug, max_rows, max_delay, drug_edits=False):
+    committer = GroupCommitter('benchmark', Vaccination.objects.ingest_each, max_rows, max_delay)
+    latencies = []
+    edit_latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    done = threading.Event()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        own = []
+        try:
+            start.wait()
+            for _ in range(creates):
+                item = vaccination(rng, drug)
+                started = time.perf_counter()
+                if mode == 'group':
+                    committer.submit(item)
+                else:
+                    item.save()
+                own.append(time.perf_counter() - started)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(own)
+
+    def editor():
+        edited = Drug.objects.get(id=drug.id)
+        try:
+            while not done.is_set():
+                edited.name = f'Benchmark {len(edit_latencies)}'
+                started = time.perf_counter()
+                edited.save()
+                edit_latencies.append(time.perf_counter() - started)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    edit_thread = threading.Thread(target=editor) if drug_edits else None
+    if edit_thread is not None:
+        edit_thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    if edit_thread is not None:
+        edit_thread.join()
+
+    result = summary(latencies, errors, elapsed)
+    result['drug_p50_ms'] = statistics.median(edit_latencies) * 1000 if edit_latencies else None
+    return result
+
+
+def run_asgi(mode, concurrency, creates, drug, max_rows, max_delay):
+    committer = GroupCommitter('benchmark', Vaccination.objects.ingest_each, max_rows, max_delay)
+    write = sync_to_async(committer.submit if mode == 'asgi-group' else Vaccination.save, thread_sensitive=True)
+    latencies = []
+    errors = []
+
+    async def worker(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(creates):
+                item = vaccination(rng, drug)
+                started = time.perf_counter()
+                await write(item)
+                latencies.append(time.perf_counter() - started)
+        except Exception as exc:
+            errors.append(exc)
+
+    async def main():
+        await asyncio.gather(*[worker(seed) for seed in range(concurrency)])
+        # `connection` is per thread: close the one of the write thread.
+        await sync_to_async(lambda: connection.close(), thread_sensitive=True)()
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    result = summary(latencies, errors, time.perf_counter() - started)
+    result['drug_p50_ms'] = None
+    return result
+
+
+def summary(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        'rows_per_second': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--creates', type=int, default=100, help="Creates per thread.")
+    parser.add_argument('--max-rows', type=int, default=settings.VACCINATION_GROUP_COMMIT_MAX_ROWS)
+    parser.add_argument('--max-delay', type=float, default=settings.VACCINATION_GROUP_COMMIT_MAX_DELAY)
+    parser.add_argument('--drug-edits', action='store_true',
+                        help="Rename the drug in a loop during the thread modes.")
+    args = parser.parse_args()
+
+    drug, _ = Drug.objects.get_or_create(code=DRUG_CODE, defaults={'name': 'Benchmark', 'description': ''})
+    try:
+        print(f"{'threads':>7}  {'mode':<10}  {'rows/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}  {'drug ms':>8}  errors")
+        for concurrency in args.concurrency:
+            for mode in ('single', 'group', 'asgi', 'asgi-group'):
+                if mode.startswith('asgi'):
+                    result = run_asgi(mode, concurrency, args.creates, drug, args.max_rows, args.max_delay)
+                else:
+                    result = run(mode, concurrency, args.creates, drug, args.max_rows, args.max_delay,
+                                 args.drug_edits)
+                drug_p50 = '-' if result['drug_p50_ms'] is None else f"{result['drug_p50_ms']:.2f}"
+                print(f"{concurrency:>7}  {mode:<10}  {result['rows_per_second']:>9.0f}  {result['p50_ms']:>8.2f}  "
+                      f"{result['p99_ms']:>8.2f}  {drug_p50:>8}  {result['errors']}")
+    finally:
+        Vaccination.objects.filter(drug=drug).delete()
+        VaccinationDailyStat.objects.filter(drug=drug).delete()
+        drug.delete()
+        bump_version(Vaccination.version_name)
+        drug_cache.invalidate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark of the orjson renderer and parser against DRF's stock JSON ones.
+
+Renders vaccination list pages shaped like the API's (`page_size` rows with
+their nested drug) and parses bulk ingest bodies, checking on the way that
+both implementations agree:
+
+    python benchmarks/json_rendering.py --rows 100 1000 --repeat 200
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portal.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from portal.parsers import ORJSONParser  # noqa: E402
+from portal.renderers import ORJSONRenderer  # noqa: E402
+from vaccinations.rut import compute_verification_digit  # noqa: E402
+
+
+def rut(rng):
+    number = rng.randrange(1000000, 26000000)
+    return f'{number}{compute_verification_digit(number)}'
+
+
+def vaccination_page(rng, rows):
+    drugs = [{'name': f'Vacuna {n}', 'code': f'drug{n}', 'description': f'Descripción {n}'} for n in range(20)]
+    start = datetime(2020, 9, 1, tzinfo=timezone.utc)
+    return {
+        'next': 'http://testserver/api/vaccinations?cursor=eyJwIjpbIjIwMjAtMDktMDFUMTI6MDA6MDBaIiwxMDBdfQ%3D%3D',
+        'previous': None,
+        'results': [{
+            'rut': rut(rng),
+            'dose': '%.2f' % (rng.randrange(15, 101) / 100),
+            'date': (start + timedelta(seconds=rng.randrange(86400 * 365), microseconds=rng.randrange(10 ** 6)))
+            .isoformat().replace('+00:00', 'Z'),
+            'drug': rng.choice(drugs),
+        } for _ in range(rows)],
+    }
+
+
+def bulk_body(rng, rows):
+    records = [{'rut': rut(rng), 'dose': '%.2f' % (rng.randrange(15, 101) / 100), 'drug_id': rng.randrange(1, 21)}
+               for _ in range(rows)]
+    return JSONRenderer().render(records)
+
+
+def best(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print('%-8s %6s %12s %12s %8s' % ('', 'rows', 'stock ms', 'orjson ms', 'speedup'))
+    for rows in args.rows:
+        page = vaccination_page(rng, rows)
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        assert stock.render(page) == fast.render(page)
+        stock_ms = best(lambda: stock.render(page), args.repeat)
+        fast_ms = best(lambda: fast.render(page), args.repeat)
+        print('%-8s %6d %12.3f %12.3f %7.1fx' % ('render', rows, stock_ms, fast_ms, stock_ms / fast_ms))
+
+        body = bulk_body(rng, rows)
+        stock, fast = JSONParser(), ORJSONParser()
+        assert stock.parse(io.BytesIO(body)) == fast.parse(io.BytesIO(body))
+        stock_ms = best(lambda: stock.parse(io.BytesIO(body)), args.repeat)
+        fast_ms = best(lambda: fast.parse(io.BytesIO(body)), args.repeat)
+        print('%-8s %6d %12.3f %12.3f %7.1fx' % ('parse', rows, stock_ms, fast_ms, stock_ms / fast_ms))
+
+
+if __name__ == '__main__':
+    main()
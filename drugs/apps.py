@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class DrugsConfig(AppConfig):
     name = 'drugs'
+
+    def ready(self):
+        from drugs import signals  # noqa: F401
@@ -0,0 +1,176 @@
+"""
+Per-process cache of the drug catalog.
+
+The catalog is small and read on almost every request, so each process keeps
+a full copy indexed by id and code. The copy is tagged with the shared
+`drugs` version stamp. The first lookup in a request compares the two and
+reloads the catalog when another process has changed it.
+
+Reading the stamp is a cache round-trip, a query with the database cache on
+App Engine, so it is only read again once `DRUG_CACHE_VERSION_TTL` seconds
+have passed since the last read. Changes made by this process are seen right
+away; changes made by other processes up to that many seconds late.
+
+The copy also keeps a search index (`drugs.search`) for type-ahead, updated on
+every reload for the drugs whose name or code changed.
+
+The catalog is always read from the primary database: a lagging replica would
+leave stale drugs tagged with the new stamp.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS
+
+from drugs.models import Drug
+from drugs.search import DrugSearchIndex
+from portal.batch import MAX_ID
+from portal.versions import bump_version, get_version
+
+_request_generation = 0
+
+
+def _start_generation(**kwargs):
+    global _request_generation
+    _request_generation += 1
+
+
+request_started.connect(_start_generation)
+
+
+class DrugCache:
+    version_name = 'drugs'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._generation = None
+        self._checked = 0.0
+        self._drugs = []
+        self._by_id = {}
+        self._by_code = {}
+        self._index = DrugSearchIndex()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def all(self):
+        """
+        Returns every drug ordered by id.
+        """
+        self._sync()
+        return self._drugs
+
+    def version(self):
+        """
+        The version stamp of the copy being served, for HTTP validators.
+        """
+        self._sync()
+        return self._version
+
+    def get(self, drug_id):
+        return self.get_many([drug_id]).get(drug_id)
+
+    def get_many(self, drug_ids):
+        """
+        Returns a `{id: Drug}` map of the requested ids that exist. Ids missing from
+        the cached copy are looked up in the database in one query, since they may
+        have been created by another process after this one last checked.
+        """
+        self._sync()
+        by_id = self._by_id
+        found = {}
+        missing = []
+        for drug_id in drug_ids:
+            drug = by_id.get(drug_id)
+            if drug is None:
+                if 0 < drug_id <= MAX_ID:
+                    missing.append(drug_id)
+            else:
+                found[drug_id] = drug
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            found.update(Drug.objects.using(DEFAULT_DB_ALIAS).in_bulk(missing))
+        return found
+
+    def get_many_by_code(self, codes):
+        """
+        Like `get_many`, returning a `{code: Drug}` map of the requested codes.
+        """
+        self._sync()
+        by_code = self._by_code
+        found = {}
+        missing = []
+        for code in codes:
+            drug = by_code.get(code)
+            if drug is None:
+                missing.append(code)
+            else:
+                found[code] = drug
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            found.update(Drug.objects.using(DEFAULT_DB_ALIAS).in_bulk(missing, field_name='code'))
+        return found
+
+    def get_by_code(self, code):
+        self._sync()
+        drug = self._by_code.get(code)
+        if drug is not None:
+            self.hits += 1
+            return drug
+        self.misses += 1
+        return Drug.objects.using(DEFAULT_DB_ALIAS).filter(code=code).first()
+
+    def search(self, query, limit=10):
+        """
+        The best `limit` drugs whose name or code matches `query`, see
+        `DrugSearchIndex.search`.
+        """
+        self._sync()
+        with self._lock:
+            return self._index.search(query, limit)
+
+    def invalidate(self):
+        """
+        Marks the catalog as changed for every process and drops the local copy.
+        """
+        bump_version(self.version_name)
+        self._version = None
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'size': len(self._drugs),
+        }
+
+    def _sync(self):
+        if self._version is not None and (
+            self._generation == _request_generation
+            or time.monotonic() - self._checked < settings.DRUG_CACHE_VERSION_TTL
+        ):
+            return
+        self._checked = time.monotonic()
+        version = get_version(self.version_name)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        self._generation = _request_generation
+
+    def _load(self, version):
+        drugs = list(Drug.objects.using(DEFAULT_DB_ALIAS).order_by('id'))
+        self._by_id = {drug.id: drug for drug in drugs}
+        self._by_code = {drug.code: drug for drug in drugs}
+        self._index.update(drugs)
+        self._drugs = drugs
+        self._version = version
+        self.reloads += 1
+
+
+drug_cache = DrugCache()
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Drug',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Name')),
+                ('code', models.CharField(max_length=10, unique=True, verbose_name='Code')),
+                ('description', models.CharField(max_length=255, verbose_name='Description')),
+            ],
+        ),
+    ]
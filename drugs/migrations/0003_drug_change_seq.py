@@ -0,0 +1,22 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drugs', '0002_drug_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drug',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, verbose_name='Change sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='drug',
+            index=models.Index(fields=['change_seq', 'id'], name='drug_change_seq_idx'),
+        ),
+    ]
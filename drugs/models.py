@@ -1,9 +1,36 @@
-from django.db import models
+from django.db import models, router, transaction
 
 from django.utils.translation import ugettext_lazy as _
 
+from portal.changes import next_change_seq, record_deletions
+
 
 class Drug(models.Model):
     name = models.CharField(verbose_name=_("Name"), max_length=255)
     code = models.CharField(verbose_name=_("Code"), max_length=10, unique=True)
     description = models.CharField(verbose_name=_("Description"), max_length=255)
+    modified = models.DateTimeField(verbose_name=_("Modified"), auto_now=True)
+    change_seq = models.BigIntegerField(verbose_name=_("Change sequence"), default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['change_seq', 'id'], name='drug_change_seq_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Stamped in the same transaction as the row for the change feed.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+        with transaction.atomic(using=using, savepoint=False):
+            self.change_seq = next_change_seq(type(self), using)
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            object_id = self.id
+            change_seq = next_change_seq(type(self), using)
+            result = super().delete(using=using, keep_parents=keep_parents)
+            record_deletions(type(self), [object_id], change_seq, using=using)
+        return result
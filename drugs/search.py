@@ -0,0 +1,129 @@
+"""
+In-memory search index over the cached drug catalog, for type-ahead on drug
+name and code.
+
+Text is compared case and accent insensitively ("Sinovác" matches "sinovac").
+A query matches a drug when it is a prefix of its code, name or a word of its
+name, or, from three characters on, a substring of its code or name. Prefixes
+are looked up by bisecting a sorted list of words and substrings through the
+trigrams of each drug, so a search only looks at drugs sharing the query's
+words or trigrams, never at the whole catalog.
+
+`DrugCache` updates the index when it reloads the catalog: only drugs added,
+removed or with a changed name or code are re-indexed.
+"""
+import bisect
+import heapq
+import unicodedata
+from collections import defaultdict
+
+# Match ranks, best first.
+EXACT, CODE_PREFIX, NAME_PREFIX, WORD_PREFIX, SUBSTRING = range(5)
+
+
+def normalize(text):
+    """
+    Lowercases `text` and strips its accents.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DrugSearchIndex:
+
+    def __init__(self):
+        self._entries = {}
+        self._words = []
+        self._trigrams = defaultdict(set)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, drugs):
+        """
+        Makes the index cover exactly `drugs`, re-indexing the ones whose name or
+        code changed. Returns how many drugs were (re-)indexed or removed.
+        """
+        drugs = {drug.id: drug for drug in drugs}
+        changed = 0
+        for drug_id in [drug_id for drug_id in self._entries if drug_id not in drugs]:
+            self._remove(drug_id)
+            changed += 1
+        for drug_id, drug in drugs.items():
+            entry = self._entries.get(drug_id)
+            if entry is not None and entry[0] == drug.name and entry[1] == drug.code:
+                # Same text: only point at the reloaded instance.
+                self._entries[drug_id] = (*entry[:-1], drug)
+                continue
+            if entry is not None:
+                self._remove(drug_id)
+            self._add(drug)
+            changed += 1
+        return changed
+
+    def search(self, query, limit=10):
+        """
+        The best `limit` drugs matching `query`, ranked by how they match, then
+        by shorter name.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        candidates = set()
+        start = bisect.bisect_left(self._words, (query,))
+        for word, drug_id in self._words[start:]:
+            if not word.startswith(query):
+                break
+            candidates.add(drug_id)
+        if len(query) >= 3:
+            postings = sorted((self._trigrams.get(trigram, ()) for trigram in trigrams(query)), key=len)
+            candidates.update(set(postings[0]).intersection(*postings[1:]))
+
+        ranked = []
+        for drug_id in candidates:
+            name, code, name_key, code_key, words, drug = self._entries[drug_id]
+            rank = self._rank(query, name_key, code_key, words)
+            if rank is not None:
+                ranked.append((rank, len(name_key), name_key, drug_id, drug))
+        return [drug for *_, drug in heapq.nsmallest(limit, ranked)]
+
+    @staticmethod
+    def _rank(query, name_key, code_key, words):
+        if query == code_key or query == name_key:
+            return EXACT
+        if code_key.startswith(query):
+            return CODE_PREFIX
+        if name_key.startswith(query):
+            return NAME_PREFIX
+        if any(word.startswith(query) for word in words):
+            return WORD_PREFIX
+        if query in code_key or query in name_key:
+            return SUBSTRING
+        # A trigram candidate whose trigrams are not contiguous in the text.
+        return None
+
+    def _add(self, drug):
+        name_key = normalize(drug.name)
+        code_key = normalize(drug.code)
+        words = {*name_key.split(), code_key}
+        self._entries[drug.id] = (drug.name, drug.code, name_key, code_key, words, drug)
+        for word in words:
+            bisect.insort(self._words, (word, drug.id))
+        for trigram in trigrams(name_key) | trigrams(code_key):
+            self._trigrams[trigram].add(drug.id)
+
+    def _remove(self, drug_id):
+        name, code, name_key, code_key, words, drug = self._entries.pop(drug_id)
+        for word in words:
+            index = bisect.bisect_left(self._words, (word, drug_id))
+            del self._words[index]
+        for trigram in trigrams(name_key) | trigrams(code_key):
+            postings = self._trigrams[trigram]
+            postings.discard(drug_id)
+            if not postings:
+                del self._trigrams[trigram]
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
 from drugs.models import Drug
+from portal.serializers import TimedListSerializer, TimedSerializerMixin
 
 
-class DrugSerializer(serializers.ModelSerializer):
+class DrugSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Drug
         fields = ['name', 'code', 'description']
+        list_serializer_class = TimedListSerializer
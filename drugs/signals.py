@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from drugs.cache import drug_cache
+from drugs.models import Drug
+
+
+@receiver(post_save, sender=Drug)
+@receiver(post_delete, sender=Drug)
+def invalidate_drug_cache(sender, **kwargs):
+    # Invalidate right away for this process and again once the change is visible
+    # to others, in case one of them reloaded the catalog in between.
+    drug_cache.invalidate()
+    transaction.on_commit(drug_cache.invalidate)
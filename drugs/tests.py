@@ -1,12 +1,17 @@
 import json
 
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django.urls import reverse
 from rest_framework import status
 
+from drugs.cache import drug_cache
 from drugs.models import Drug
+from drugs.search import DrugSearchIndex
+from portal.versions import bump_version
 
 
 class DrugSetUp(TestCase):
@@ -39,13 +44,28 @@ class DrugSetUp(TestCase):
 class TestDrugListCreateView(DrugSetUp):
 
     def test_get(self):
-        resp = self.client.get(reverse('drug:list_create'), content_type=self.content_type, **self.headers)
+        resp = self.client.get(reverse('drugs:list_create'), content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        drug_list = resp.data
+        drug_list = resp.data['results']
 
         drug_count = Drug.objects.count()
         self.assertEqual(len(drug_list), drug_count)
 
+    def test_get_paginated(self):
+        Drug.objects.bulk_create([Drug(name=f'Drug{i}', code=f'code{i}', description='') for i in range(4)])
+
+        resp = self.client.get(reverse('drugs:list_create') + '?page_size=2', content_type=self.content_type,
+                               **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([drug['code'] for drug in resp.data['results']], ['drug1', 'code0'])
+
+        resp = self.client.get(resp.data['next'], content_type=self.content_type, **self.headers)
+        self.assertEqual([drug['code'] for drug in resp.data['results']], ['code1', 'code2'])
+
+        resp = self.client.get(resp.data['next'], content_type=self.content_type, **self.headers)
+        self.assertEqual([drug['code'] for drug in resp.data['results']], ['code3'])
+        self.assertIsNone(resp.data['next'])
+
     def test_post(self):
         drug_count = Drug.objects.count()
 
@@ -55,7 +75,7 @@ class TestDrugListCreateView(DrugSetUp):
             'description': 'Drug 2 description'
         }
 
-        resp = self.client.post(reverse('drug:list_create'), new_drug_data, content_type=self.content_type,
+        resp = self.client.post(reverse('drugs:list_create'), new_drug_data, content_type=self.content_type,
                                 **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
 
@@ -68,7 +88,7 @@ class TestDrugListCreateView(DrugSetUp):
             'code': 'drug2',
             'description': 'Drug 3 description'
         }
-        resp = self.client.post(reverse('drug:list_create'), new_drug_data, content_type=self.content_type,
+        resp = self.client.post(reverse('drugs:list_create'), new_drug_data, content_type=self.content_type,
                                 **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
 
@@ -79,14 +99,14 @@ class TestDrugListCreateView(DrugSetUp):
 class TestDrugRetrieveUpdateDestroyView(DrugSetUp):
 
     def test_get(self):
-        resp = self.client.get(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}),
+        resp = self.client.get(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}),
                                content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         drug_data = resp.data
 
         self.assertEqual(drug_data['code'], self.drug.code)
 
-        resp = self.client.get(reverse('drug:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.get(reverse('drugs:retrieve_update_delete', kwargs={'id': 1000}),
                                **self.headers, content_type=self.content_type)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
@@ -95,7 +115,7 @@ class TestDrugRetrieveUpdateDestroyView(DrugSetUp):
         new_drug_data = {
             'code': new_code,
         }
-        resp = self.client.patch(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}), new_drug_data,
+        resp = self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), new_drug_data,
                                  content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
 
@@ -106,12 +126,12 @@ class TestDrugRetrieveUpdateDestroyView(DrugSetUp):
         new_drug_data = {
             'code': new_code,
         }
-        resp = self.client.patch(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}), new_drug_data,
+        resp = self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), new_drug_data,
                                  content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue('code' in resp.data)
 
-        resp = self.client.patch(reverse('drug:retrieve_update_delete', kwargs={'id': 1000}), new_drug_data,
+        resp = self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': 1000}), new_drug_data,
                                  content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
@@ -122,7 +142,7 @@ class TestDrugRetrieveUpdateDestroyView(DrugSetUp):
             'code': new_code,
             'description': self.drug.description
         }
-        resp = self.client.put(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}), drug_update_data,
+        resp = self.client.put(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), drug_update_data,
                                content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
 
@@ -135,27 +155,259 @@ class TestDrugRetrieveUpdateDestroyView(DrugSetUp):
             'code': new_code,
             'description': self.drug.description
         }
-        resp = self.client.patch(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}), drug_update_data,
+        resp = self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), drug_update_data,
                                  content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue('code' in resp.data)
 
-        resp = self.client.put(reverse('drug:retrieve_update_delete', kwargs={'id': 1000}), drug_update_data,
+        resp = self.client.put(reverse('drugs:retrieve_update_delete', kwargs={'id': 1000}), drug_update_data,
                                content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_delete(self):
         drug_count = Drug.objects.count()
 
-        resp = self.client.delete(reverse('drug:retrieve_update_delete', kwargs={'id': self.drug.id}),
+        resp = self.client.delete(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}),
                                   content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
         drug_count -= 1
 
         self.assertEqual(drug_count, Drug.objects.count())
 
-        resp = self.client.delete(reverse('drug:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.delete(reverse('drugs:retrieve_update_delete', kwargs={'id': 1000}),
                                   content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
         self.assertEqual(drug_count, Drug.objects.count())
+
+
+class TestDrugCache(DrugSetUp):
+
+    def get_codes(self):
+        resp = self.client.get(reverse('drugs:list_create'), content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [drug['code'] for drug in resp.data['results']]
+
+    def test_list_from_memory(self):
+        self.get_codes()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_codes(), ['drug1'])
+
+    def test_invalidation(self):
+        self.assertEqual(self.get_codes(), ['drug1'])
+
+        self.client.post(reverse('drugs:list_create'), {'name': 'Drug 2', 'code': 'drug2', 'description': 'drug2'},
+                         content_type=self.content_type, **self.headers)
+        self.assertEqual(self.get_codes(), ['drug1', 'drug2'])
+
+        self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), {'code': 'drug1b'},
+                          content_type=self.content_type, **self.headers)
+        self.assertEqual(self.get_codes(), ['drug1b', 'drug2'])
+
+        self.client.delete(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}),
+                           content_type=self.content_type, **self.headers)
+        self.assertEqual(self.get_codes(), ['drug2'])
+
+    @override_settings(DRUG_CACHE_VERSION_TTL=0)
+    def test_version_bump_from_another_process(self):
+        self.assertEqual(self.get_codes(), ['drug1'])
+
+        # Another process writes directly and only bumps the shared stamp.
+        Drug.objects.filter(id=self.drug.id).update(code='drug1b')
+        self.assertEqual(self.get_codes(), ['drug1'])
+
+        bump_version(drug_cache.version_name)
+        self.assertEqual(self.get_codes(), ['drug1b'])
+
+    @override_settings(DRUG_CACHE_VERSION_TTL=60)
+    def test_version_ttl(self):
+        self.assertEqual(self.get_codes(), ['drug1'])
+        etag = self.client.get(reverse('drugs:list_create'), **self.headers)['ETag']
+
+        # Changes of other processes are seen once the TTL has passed, and the
+        # ETag keeps matching the copy served meanwhile.
+        Drug.objects.filter(id=self.drug.id).update(code='drug1b')
+        bump_version(drug_cache.version_name)
+        self.assertEqual(self.get_codes(), ['drug1'])
+        resp = self.client.get(reverse('drugs:list_create'), HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        drug_cache._checked -= 60
+        self.assertEqual(self.get_codes(), ['drug1b'])
+
+    def test_counters(self):
+        drug_cache.all()
+        stats = drug_cache.stats()
+
+        self.assertEqual(drug_cache.get(self.drug.id), self.drug)
+        self.assertIsNone(drug_cache.get(1000))
+        self.assertEqual(drug_cache.get_by_code('drug1'), self.drug)
+        self.assertEqual(drug_cache.stats()['hits'], stats['hits'] + 2)
+        self.assertEqual(drug_cache.stats()['misses'], stats['misses'] + 1)
+
+
+class TestDrugConditionalGet(DrugSetUp):
+
+    def test_get(self):
+        for url in (reverse('drugs:list_create'),
+                    reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id})):
+            resp = self.client.get(url, content_type=self.content_type, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            etag = resp['ETag']
+
+            resp = self.client.get(url, content_type=self.content_type, HTTP_IF_NONE_MATCH=etag, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}),
+                              {'description': f'{url} changed'}, content_type=self.content_type, **self.headers)
+            resp = self.client.get(url, content_type=self.content_type, HTTP_IF_NONE_MATCH=etag, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+
+class TestDrugSparseFieldsets(DrugSetUp):
+
+    def test_list(self):
+        resp = self.client.get(reverse('drugs:list_create') + '?fields=code,name', content_type=self.content_type,
+                               **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['results'], [{'name': 'Drug1', 'code': 'drug1'}])
+
+    def test_retrieve(self):
+        url = reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id})
+        self.client.get(url, content_type=self.content_type, **self.headers)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url + '?fields=code', content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, {'code': 'drug1'})
+        select = [query['sql'] for query in queries if 'drugs_drug' in query['sql']][-1]
+        self.assertIn('"code"', select)
+        self.assertNotIn('"description"', select)
+
+    def test_unknown_field(self):
+        resp = self.client.get(reverse('drugs:list_create') + '?fields=code,price', content_type=self.content_type,
+                               **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['fields'], ['Unknown fields: price'])
+
+    def test_writes_ignore_fields(self):
+        resp = self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}) + '?fields=code',
+                                 {'description': 'changed'}, content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, {'name': 'Drug1', 'code': 'drug1', 'description': 'changed'})
+
+
+class TestDrugBatchRetrieve(DrugSetUp):
+
+    def test_order_and_missing(self):
+        Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        resp = self.client.get(reverse('drugs:list_create') + '?codes=drug2,nope,drug1,drug2&fields=code',
+                               content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, {'results': [{'code': 'drug2'}, {'code': 'drug1'}], 'missing': ['nope']})
+
+
+class TestDrugSearch(DrugSetUp):
+
+    def setUp(self):
+        super().setUp()
+        for name, code in [('Sinovác CoronaVac', 'sinovac'), ('Pfizer BioNTech', 'pfizer'), ('AstraZeneca', 'az'),
+                           ('Vacuna Pfizer pediátrica', 'pfped')]:
+            Drug.objects.create(name=name, code=code, description='')
+        drug_cache.invalidate()
+        self.url = reverse('drugs:search')
+
+    def search(self, query, **params):
+        resp = self.client.get(self.url, {'q': query, **params}, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [drug['code'] for drug in resp.data['results']]
+
+    def test_case_and_accents(self):
+        self.assertEqual(self.search('SINOVAC'), ['sinovac'])
+        self.assertEqual(self.search('pediatrica'), ['pfped'])
+
+    def test_ranking(self):
+        # Code prefix, then name prefix, then word prefix, shorter names first.
+        self.assertEqual(self.search('pf'), ['pfizer', 'pfped'])
+        self.assertEqual(self.search('pfizer'), ['pfizer', 'pfped'])
+        self.assertEqual(self.search('vac'), ['pfped', 'sinovac'])
+        self.assertEqual(self.search('az'), ['az'])
+
+    def test_substring(self):
+        self.assertEqual(self.search('zeneca'), ['az'])
+        self.assertEqual(self.search('ntech'), ['pfizer'])
+        self.assertEqual(self.search('ze'), [])
+        self.assertEqual(self.search('zxq'), [])
+
+    def test_limit(self):
+        self.assertEqual(self.search('p', limit=1), ['pfizer'])
+
+    def test_fields(self):
+        resp = self.client.get(self.url, {'q': 'az', 'fields': 'name'}, **self.headers)
+        self.assertEqual(resp.data['results'], [{'name': 'AstraZeneca'}])
+
+    def test_requires_query(self):
+        resp = self.client.get(self.url, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('q', resp.data)
+
+    def test_no_drug_queries(self):
+        self.search('az')
+        with CaptureQueriesContext(connection) as queries:
+            self.search('astra')
+        self.assertFalse([query for query in queries if 'drugs_drug' in query['sql']])
+
+    def test_incremental_update(self):
+        drug = Drug.objects.get(code='az')
+        drug.name = 'Vaxzevria'
+        drug.save()
+        Drug.objects.get(code='sinovac').delete()
+        self.assertEqual(self.search('vax'), ['az'])
+        self.assertEqual(self.search('astra'), [])
+        self.assertEqual(self.search('sino'), [])
+
+        index = DrugSearchIndex()
+        drugs = list(Drug.objects.order_by('id'))
+        self.assertEqual(index.update(drugs), len(drugs))
+        drugs[0].description = 'changed'
+        drugs[1].name = 'Renamed'
+        self.assertEqual(index.update(drugs[1:]), 2)
+        self.assertEqual(index.search('renamed'), [drugs[1]])
+        self.assertEqual(len(index), len(drugs) - 1)
+
+
+class TestDrugIdempotency(DrugSetUp):
+
+    def test_replay(self):
+        data = {'name': 'Drug2', 'code': 'drug2', 'description': 'drug2'}
+        first = self.client.post(reverse('drugs:list_create'), data, content_type=self.content_type,
+                                 HTTP_IDEMPOTENCY_KEY='drug2', **self.headers)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        replay = self.client.post(reverse('drugs:list_create'), data, content_type=self.content_type,
+                                  HTTP_IDEMPOTENCY_KEY='drug2', **self.headers)
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(Drug.objects.filter(code='drug2').count(), 1)
+
+
+class TestDrugChangeFeed(DrugSetUp):
+
+    def test_changes(self):
+        resp = self.client.get(reverse('drugs:changes'), **self.headers)
+        self.assertEqual(resp.data['changes'], [
+            {'id': self.drug.id, 'deleted': False, 'data': {'name': 'Drug1', 'code': 'drug1', 'description': 'drug1'}},
+        ])
+        cursor = resp.data['cursor']
+
+        drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        self.client.patch(reverse('drugs:retrieve_update_delete', kwargs={'id': drug.id}), {'description': 'changed'},
+                          content_type=self.content_type, **self.headers)
+        self.client.delete(reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}), **self.headers)
+
+        resp = self.client.get(reverse('drugs:changes'), {'since': cursor}, **self.headers)
+        self.assertEqual(resp.data['changes'], [
+            {'id': drug.id, 'deleted': False, 'data': {'name': 'Drug2', 'code': 'drug2', 'description': 'changed'}},
+            {'id': self.drug.id, 'deleted': True, 'data': None},
+        ])
@@ -1,9 +1,13 @@
 from django.urls import path
 
-from drugs.views import drug_list_create_view, drug_retrieve_update_delete_view
+from drugs.views import (
+    drug_change_feed_view, drug_list_create_view, drug_retrieve_update_delete_view, drug_search_view,
+)
 
 app_name = "drugs"
 urlpatterns = [
     path('', drug_list_create_view, name='list_create'),
     path('/<int:id>', drug_retrieve_update_delete_view, name='retrieve_update_delete'),
+    path('/changes', drug_change_feed_view, name='changes'),
+    path('/search', drug_search_view, name='search'),
 ]
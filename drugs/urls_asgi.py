@@ -0,0 +1,14 @@
+from django.urls import path
+
+from drugs.views import (
+    drug_change_feed_view, drug_list_create_view, drug_retrieve_update_delete_view, drug_search_view,
+)
+from portal.asgi_views import async_read_view
+
+app_name = "drugs"
+urlpatterns = [
+    path('', async_read_view(drug_list_create_view), name='list_create'),
+    path('/<int:id>', async_read_view(drug_retrieve_update_delete_view), name='retrieve_update_delete'),
+    path('/changes', async_read_view(drug_change_feed_view), name='changes'),
+    path('/search', async_read_view(drug_search_view), name='search'),
+]
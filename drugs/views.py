@@ -1,21 +1,65 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from drugs.cache import drug_cache
 from drugs.models import Drug
 from drugs.serializers import DrugSerializer
+from portal.batch import BatchRetrieveMixin
+from portal.changes import ChangeFeedAPIView
+from portal.conditional import ConditionalGetMixin
+from portal.fieldsets import SparseFieldsetsMixin
+from portal.idempotency import IdempotentCreateMixin
+from portal.replicas import ReplicaReadMixin
+from portal.timing import timed
+from portal.versions import get_version_time
 
 
-class DrugListCreateAPIView(ListCreateAPIView):
+class DrugConditionalGetMixin(ConditionalGetMixin):
+
+    def get_validators(self):
+        # The stamp of the cached copy the list is served from, which may be
+        # up to DRUG_CACHE_VERSION_TTL behind the shared one.
+        version = drug_cache.version()
+        return version, get_version_time(version)
+
+
+class DrugListCreateAPIView(ReplicaReadMixin, IdempotentCreateMixin, DrugConditionalGetMixin, SparseFieldsetsMixin,
+                            BatchRetrieveMixin, ListCreateAPIView):
     serializer_class = DrugSerializer
     queryset = Drug.objects.all()
+    batch_query_param = 'codes'
 
     permission_classes = [IsAuthenticated]
 
+    def get_replica_validators(self, alias):
+        # Served from the drug cache, which reads the primary, not the replica.
+        return self.get_validators()
+
+    def to_batch_key(self, value):
+        return value
+
+    def list(self, request, *args, **kwargs):
+        codes = self.get_batch_keys()
+        if codes is not None:
+            drugs = drug_cache.get_many_by_code(codes)
+            data = self.get_serializer(list(drugs.values()), many=True).data
+            return self.get_batch_response(codes, dict(zip(drugs, data)))
+
+        drugs = drug_cache.all()
+        page = self.paginate_queryset(drugs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(drugs, many=True).data)
+
 
 drug_list_create_view = DrugListCreateAPIView.as_view()
 
 
-class DrugRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class DrugRetrieveUpdateDestroyAPIView(ReplicaReadMixin, DrugConditionalGetMixin, SparseFieldsetsMixin,
+                                       RetrieveUpdateDestroyAPIView):
     serializer_class = DrugSerializer
     queryset = Drug.objects.all()
     lookup_field = 'id'
@@ -25,3 +69,45 @@ class DrugRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
 
 
 drug_retrieve_update_delete_view = DrugRetrieveUpdateDestroyAPIView.as_view()
+
+
+class DrugSearchAPIView(DrugConditionalGetMixin, SparseFieldsetsMixin, GenericAPIView):
+    """
+    Type-ahead on drug name and code: `?q=` returns the best `?limit=` matches
+    from the per-process drug cache, without querying the database.
+    """
+    serializer_class = DrugSerializer
+    queryset = Drug.objects.all()
+    pagination_class = None
+    default_limit = 10
+    max_limit = 50
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q')
+        if query is None:
+            raise ValidationError({'q': [_("This parameter is required.")]})
+        with timed('search'):
+            drugs = drug_cache.search(query, self.get_limit())
+        return Response({'results': self.get_serializer(drugs, many=True).data})
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+
+drug_search_view = DrugSearchAPIView.as_view()
+
+
+class DrugChangeFeedAPIView(ChangeFeedAPIView):
+    serializer_class = DrugSerializer
+    queryset = Drug.objects.all()
+
+    permission_classes = [IsAuthenticated]
+
+
+drug_change_feed_view = DrugChangeFeedAPIView.as_view()
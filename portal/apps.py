@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class PortalConfig(AppConfig):
+    name = 'portal'
+
+    def ready(self):
+        from portal import signals  # noqa: F401
@@ -0,0 +1,30 @@
+"""
+ASGI config for portal project.
+
+It exposes the ASGI callable as a module-level variable named ``application``
+and routes requests through ``portal.urls_asgi``, where the read-heavy
+endpoints are async views.
+
+This is what ``django.core.asgi.get_asgi_application`` does, split into steps
+so ``portal.startup`` can time each of them.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+from portal.startup import startup_timer  # noqa: I001 must be first, it starts the cold start clock
+
+import os
+
+import django
+from django.core.handlers.asgi import ASGIHandler
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portal.settings")
+os.environ.setdefault("PORTAL_ASGI", "1")
+startup_timer.mark('imports')
+
+django.setup(set_prefix=False)
+startup_timer.mark('django_setup')
+
+application = ASGIHandler()
+startup_timer.mark('handler')
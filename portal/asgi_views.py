@@ -0,0 +1,46 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from portal.connections import check_connections, release_connections
+from portal.timing import timed
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def async_read_view(view):
+    """
+    Turns a sync DRF view into an async view for the ASGI deployment.
+
+    The ORM in Django 3.1 is sync only, so reads still run the DRF view, but in
+    the shared thread pool instead of Django's single thread for sync code: the
+    event loop keeps accepting requests while many reads wait on the database
+    concurrently. Writes keep running in the single thread-sensitive executor.
+    """
+
+    def read(request, *args, **kwargs):
+        # Pool threads are not covered by the request_started/request_finished
+        # connection handling, so each read cleans up its own connection.
+        close_old_connections()
+        check_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                with timed('render'):
+                    response = response.render()
+            return response
+        finally:
+            release_connections()
+            close_old_connections()
+
+    read_async = sync_to_async(read, thread_sensitive=False)
+    write_async = sync_to_async(view, thread_sensitive=True)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read_async(request, *args, **kwargs)
+        return await write_async(request, *args, **kwargs)
+
+    async_view.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    async_view.__name__ = view.__name__
+    async_view.__doc__ = view.__doc__
+    return async_view
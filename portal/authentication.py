@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from portal.timing import timed
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache of users with a time-to-live per entry.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            user, cached_at = entry
+            if time.monotonic() - cached_at >= self.ttl:
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic())
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that serves the request user from a per-process cache of
+    recently authenticated active users instead of querying for it every time.
+
+    A user that is deactivated or deleted is rejected immediately by the process
+    that made the change, and by every other process once its cached entry
+    expires after `JWT_USER_CACHE_TTL` seconds.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
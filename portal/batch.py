@@ -0,0 +1,62 @@
+"""
+Batch retrieve on list endpoints: `?ids=3,1,2` returns those objects, in that
+order, in one response and one query instead of a request per object.
+"""
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+# Largest id an AutoField can hold. Larger ids cannot exist, and SQLite fails
+# on ids over 64 bits instead of finding nothing.
+MAX_ID = 2 ** 31 - 1
+
+
+class BatchRetrieveMixin:
+    """
+    Views read the requested keys with `get_batch_keys()`, look them up in a
+    single query and answer with `get_batch_response()`: the `results` found in
+    request order and the `missing` keys. At most `BATCH_RETRIEVE_MAX_KEYS`
+    keys are accepted per request.
+    """
+    batch_query_param = 'ids'
+    invalid_batch_key_message = _("Invalid value: %s")
+
+    def to_batch_key(self, value):
+        key = int(value)
+        if not 0 < key <= MAX_ID:
+            raise ValueError(value)
+        return key
+
+    def get_batch_keys(self):
+        """
+        The keys of `?<batch_query_param>=` without duplicates, or None when the
+        parameter is not given.
+        """
+        value = self.request.query_params.get(self.batch_query_param)
+        if value is None:
+            return None
+        keys = {}
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                key = self.to_batch_key(part)
+            except ValueError:
+                raise ValidationError({self.batch_query_param: [self.invalid_batch_key_message % part]})
+            keys[key] = None
+            if len(keys) > settings.BATCH_RETRIEVE_MAX_KEYS:
+                raise ValidationError({self.batch_query_param: [
+                    _("Too many values. At most %d are allowed") % settings.BATCH_RETRIEVE_MAX_KEYS
+                ]})
+        return list(keys)
+
+    def get_batch_response(self, keys, found):
+        """
+        `found` maps the keys that exist to their representation.
+        """
+        return Response({
+            'results': [found[key] for key in keys if key in found],
+            'missing': [key for key in keys if key not in found],
+        })
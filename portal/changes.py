@@ -0,0 +1,144 @@
+"""
+Change feeds: the creates, updates and deletes of a model since a client's
+cursor, so offline clients sync deltas instead of downloading whole lists.
+
+Every write transaction takes the next number from the `ChangeCounter` row of
+its model and stamps it on the rows it writes (`change_seq`) or, for deletes,
+on a `Tombstone`. A feed page lists rows and tombstones in (change_seq, id)
+order after the cursor, and the client keeps the cursor of the last page for
+its next sync.
+
+Taking a number updates the counter row, which stays locked until the
+transaction ends: writers of a model queue there, so its numbers commit in
+order and a number is reused if its transaction rolls back. The committed
+counter value is thus the end of an unbroken run of committed changes, and the
+model's feed stops at it. The price is that write transactions of a model run
+one at a time from the moment they take their number; writes of other models
+do not wait for them. Models take it before any other write of the
+transaction, so every writer takes its locks in the same order.
+"""
+import heapq
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from portal.batch import MAX_ID
+from portal.models import ChangeCounter, Tombstone
+
+# Largest value of the BigIntegerField change_seq columns.
+MAX_CHANGE_SEQ = 2 ** 63 - 1
+
+
+def next_change_seq(model, using=DEFAULT_DB_ALIAS):
+    """
+    Takes the next change sequence number of `model`, locking its counter until
+    the current transaction ends. Must run in the transaction of the change.
+    """
+    label = model._meta.label_lower
+    counter = ChangeCounter.objects.using(using).filter(model=label)
+    now = timezone.now()
+    if not counter.update(value=F('value') + 1, modified=now):
+        try:
+            with transaction.atomic(using=using):
+                ChangeCounter.objects.using(using).create(model=label, value=1, modified=now)
+        except IntegrityError:
+            # Created concurrently.
+            counter.update(value=F('value') + 1, modified=now)
+    return counter.values_list('value', flat=True).get()
+
+
+def record_deletions(model, object_ids, change_seq, using=DEFAULT_DB_ALIAS):
+    Tombstone.objects.using(using).bulk_create([
+        Tombstone(model=model._meta.label_lower, object_id=object_id, change_seq=change_seq)
+        for object_id in object_ids
+    ])
+
+
+def committed_change_seq(model):
+    """
+    The last change sequence number of `model` committed, 0 if none. Every
+    change of `model` up to it has committed too.
+    """
+    return ChangeCounter.objects.filter(model=model._meta.label_lower).values_list('value', flat=True).first() or 0
+
+
+def last_changes(using=DEFAULT_DB_ALIAS):
+    """
+    The `(model, change_seq, modified)` of every counter committed on database
+    `using`, by model.
+    """
+    return list(ChangeCounter.objects.using(using).order_by('model').values_list('model', 'value', 'modified'))
+
+
+class ChangeFeedAPIView(GenericAPIView):
+    """
+    A page of changes of `queryset`'s model after the `?since=` cursor, each as
+    `{"id": ..., "deleted": false, "data": {...}}`, or without data and
+    `"deleted": true` for deletes. Updates of an object list it again with its
+    current data. The response also has the `cursor` to sync from next time
+    and whether there are `more` changes after it.
+
+    Reads go to the primary: feeds must not run ahead of the rows they list.
+    """
+    cursor_query_param = 'since'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        change_seq, object_id = self.get_cursor()
+        page_size = self.get_page_size()
+        last_change_seq = committed_change_seq(self.get_queryset().model)
+
+        rows = self.get_queryset().filter(
+            Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, id__gt=object_id),
+            change_seq__lte=last_change_seq,
+        ).order_by('change_seq', 'id')[:page_size + 1]
+        tombstones = Tombstone.objects.filter(
+            Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, object_id__gt=object_id),
+            model=self.get_queryset().model._meta.label_lower, change_seq__lte=last_change_seq,
+        ).order_by('change_seq', 'object_id').values_list('change_seq', 'object_id')[:page_size + 1]
+
+        changes = list(heapq.merge(
+            ((row.change_seq, row.id, row) for row in rows),
+            ((tombstone_seq, tombstone_id, None) for tombstone_seq, tombstone_id in tombstones),
+            key=lambda change: change[:2],
+        ))
+        more = len(changes) > page_size
+        changes = changes[:page_size]
+
+        instances = [instance for _, _, instance in changes if instance is not None]
+        data = iter(self.get_serializer(instances, many=True).data)
+        results = [
+            {'id': change_id, 'deleted': instance is None, 'data': None if instance is None else next(data)}
+            for _, change_id, instance in changes
+        ]
+        if changes:
+            change_seq, object_id = changes[-1][:2]
+        return Response({'changes': results, 'cursor': f'{change_seq}.{object_id}', 'more': more})
+
+    def get_cursor(self):
+        value = self.request.query_params.get(self.cursor_query_param)
+        if not value:
+            return 0, 0
+        try:
+            change_seq, object_id = (int(part) for part in value.split('.'))
+            if not (0 <= change_seq <= MAX_CHANGE_SEQ and 0 <= object_id <= MAX_ID):
+                raise ValueError(value)
+        except ValueError:
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+        return change_seq, object_id
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
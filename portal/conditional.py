@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from portal.changes import last_changes
+from portal.replicas import get_read_alias
+
+
+class ConditionalGetMixin:
+    """
+    Adds strong `ETag` and `Last-Modified` validators to GET/HEAD responses and
+    answers `If-None-Match`/`If-Modified-Since` with 304 Not Modified before the
+    view fetches or serializes anything.
+
+    Views implement `get_validators()`, returning a key that changes whenever
+    the body would (usually table version stamps) and the last modification
+    time. The ETag also covers the query string and the negotiated media type.
+
+    Version stamps are written by the primary, so they run ahead of a lagging
+    replica. When the request reads from one (see `portal.replicas`), the
+    validators come from `get_replica_validators()` instead, by default the
+    replica's own change counters, read before the body so the ETag is never
+    newer than the rows it tags.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError('ConditionalGetMixin requires .get_validators() to be implemented')
+
+    def get_replica_validators(self, alias):
+        changes = last_changes(alias)
+        key = ','.join(f'{model}:{change_seq}' for model, change_seq, _modified in changes)
+        return f'changes:{key}', max((modified for *_, modified in changes),
+                                     default=datetime.fromtimestamp(0, timezone.utc))
+
+    def get(self, request, *args, **kwargs):
+        alias = get_read_alias()
+        key, last_modified = self.get_validators() if alias is None else self.get_replica_validators(alias)
+        digest = hashlib.sha1('\n'.join([key, request.get_full_path(), request.accepted_media_type]).encode())
+        etag = '"%s"' % digest.hexdigest()
+        timestamp = int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,48 @@
+"""
+Persistent database connections.
+
+Django keeps each thread's connection open across requests for
+`CONN_MAX_AGE` seconds, and closes it at the start or end of a request once it
+is older than that or has had an error. Before a request runs on a kept
+connection that has sat idle for `DB_CONN_HEALTH_CHECK_IDLE` seconds,
+`check_connections` also pings it, so a connection the server has dropped
+(idle timeout, failover, restart) is replaced by a fresh one instead of
+failing the request's first query. Connections in steady use skip the ping
+and its round-trip: the server is unlikely to have dropped them meanwhile.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from portal import metrics
+
+
+def check_connections():
+    """
+    Health checks the kept connections of the current thread that have been
+    idle too long and closes the ones that are no longer usable. Django
+    reconnects on the next query.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        idle = now - getattr(connection, 'portal_released', 0.0)
+        if not settings.DB_CONN_HEALTH_CHECKS or idle < settings.DB_CONN_HEALTH_CHECK_IDLE \
+                or connection.is_usable():
+            metrics.db_connections_reused.inc((connection.alias,))
+        else:
+            metrics.db_connection_failures.inc((connection.alias,))
+            connection.close()
+
+
+def release_connections():
+    """
+    Notes when the current thread's connections went idle, at the end of a
+    request.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.portal_released = now
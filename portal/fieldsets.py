@@ -0,0 +1,137 @@
+"""
+Sparse fieldsets: `?fields=rut,date,drug.code` limits a response to the listed
+fields, with dots selecting fields of nested serializers (`drug` alone keeps
+all of them), and loads only the columns those fields read.
+"""
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def parse_fields(value):
+    """
+    `'rut,drug.code,drug.name'` -> `{'rut': {}, 'drug': {'code': {}, 'name': {}}}`.
+    """
+    selection = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = selection
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return selection
+
+
+def readable_fields(serializer):
+    return {name: field for name, field in serializer.fields.items() if not field.write_only}
+
+
+def unknown_fields(serializer, selection, prefix=''):
+    """
+    Dotted paths in `selection` that are not readable fields of `serializer`.
+    """
+    fields = readable_fields(serializer)
+    unknown = []
+    for name, subselection in selection.items():
+        field = fields.get(name)
+        if field is None or subselection and not isinstance(field, BaseSerializer):
+            unknown.append(prefix + name)
+        elif subselection:
+            unknown.extend(unknown_fields(field, subselection, prefix + name + '.'))
+    return unknown
+
+
+def trim_serializer(serializer, selection):
+    """
+    Drops the readable fields of `serializer` that `selection` leaves out.
+    Write-only fields are kept, they are never in the output.
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    for name, field in list(serializer.fields.items()):
+        if field.write_only:
+            continue
+        if name not in selection:
+            serializer.fields.pop(name)
+        elif selection[name]:
+            trim_serializer(field, selection[name])
+
+
+def selected_columns(serializer, selection):
+    """
+    Model columns, as `only()` takes them, read by the `selection` of
+    `serializer`. Fields whose source is the whole object (`source='*'`) must
+    list their columns in a `columns` attribute.
+    """
+    columns = []
+    fields = readable_fields(serializer)
+    for name, subselection in selection.items():
+        field = fields[name]
+        if isinstance(field, BaseSerializer):
+            nested = selected_columns(field, subselection or {child: {} for child in readable_fields(field)})
+            columns.append(field.source)
+            columns.extend('%s__%s' % (field.source, column) for column in nested)
+        elif field.source == '*':
+            columns.extend(field.columns)
+        else:
+            columns.append(field.source)
+    return columns
+
+
+class SparseFieldsetsMixin:
+    """
+    Adds `?fields=` to a generic view's GET requests: the serializer keeps the
+    selected fields only and the queryset loads the columns they read plus
+    `required_columns`, the ones the view itself needs. Select related
+    relations are dropped when no nested field is selected.
+    """
+    fields_query_param = 'fields'
+    required_columns = ['id']
+
+    _fields_selection = False
+
+    def get_fields_selection(self):
+        """
+        The parsed `?fields=` of the request, or None when the whole
+        representation is wanted.
+        """
+        if self._fields_selection is False:
+            self._fields_selection = None
+            value = self.request.query_params.get(self.fields_query_param)
+            if value and self.request.method in SAFE_METHODS:
+                selection = parse_fields(value)
+                unknown = unknown_fields(self.get_serializer_class()(), selection)
+                if unknown:
+                    raise ValidationError({self.fields_query_param: [
+                        _("Unknown fields: %s") % ', '.join(unknown)
+                    ]})
+                self._fields_selection = selection or None
+        return self._fields_selection
+
+    def get_selected_columns(self):
+        selection = self.get_fields_selection()
+        if selection is None:
+            return None
+        columns = list(self.required_columns)
+        for column in selected_columns(self.get_serializer_class()(), selection):
+            if column not in columns:
+                columns.append(column)
+        return columns
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        columns = self.get_selected_columns()
+        if columns is None:
+            return queryset
+        if not any('__' in column for column in columns):
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        selection = self.get_fields_selection()
+        if selection is not None:
+            trim_serializer(serializer, selection)
+        return serializer
@@ -0,0 +1,73 @@
+"""
+Group commit: concurrent writers in a process share one INSERT and commit.
+
+Each caller of `GroupCommitter.submit` adds its item to the open batch and
+waits. The caller that opened the batch leads it: it waits until the batch has
+`max_rows` items or `max_delay` seconds have passed, closes it, writes every
+item with one call to `flush` on its own connection and wakes the others up.
+There is no background thread, so an idle process holds nothing open.
+
+`flush` returns one result per item, either the written item or the exception
+that kept it from being written, which `submit` returns or raises in that
+item's caller.
+"""
+import threading
+
+from portal import metrics
+
+
+class _Batch:
+
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class GroupCommitter:
+
+    def __init__(self, name, flush, max_rows, max_delay):
+        self.name = name
+        self.flush = flush
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def submit(self, item):
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_rows:
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_delay)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        result = batch.results[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _flush(self, batch):
+        try:
+            batch.results = self.flush(batch.items)
+        except Exception as exc:
+            batch.results = [exc] * len(batch.items)
+        finally:
+            if batch.results is None:
+                batch.results = [RuntimeError("Group commit flush failed")] * len(batch.items)
+            batch.done.set()
+        metrics.group_commit_rows.observe((self.name,), len(batch.items))
@@ -0,0 +1,82 @@
+"""
+`Idempotency-Key` support for create endpoints.
+
+Clients retrying a POST send the same key with every attempt. The first
+response is stored under (user, key) for `settings.IDEMPOTENCY_KEY_TTL`
+seconds and retries get it back without the view running again. Errors the
+view raises are stored like any other response, except server errors, which
+release the key so that a retry runs the request again. A request that never
+stores its response (its process died or timed out) keeps the key for at most
+`settings.IDEMPOTENCY_KEY_LEASE` seconds, after which a retry runs it again.
+"""
+import hashlib
+
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from portal.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("A request with this idempotency key is still being processed.")
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _("This idempotency key was used for a different request.")
+    default_code = 'idempotency_key_mismatch'
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.get_full_path().encode(), request.body):
+        digest.update(part)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Makes a view's POST handler idempotent for requests with an
+    `Idempotency-Key` header.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return super().post(request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({IDEMPOTENCY_HEADER: [_("Must be between 1 and 255 characters long.")]})
+
+        fingerprint = request_fingerprint(request)
+        record, created = IdempotencyKey.objects.claim(request.user, key, fingerprint)
+        if not created:
+            if record is not None and record.fingerprint != fingerprint:
+                raise IdempotencyKeyMismatch()
+            if record is None or record.status_code is None:
+                raise IdempotencyKeyInUse()
+            response = Response(record.response, status=record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except APIException as exc:
+            response = self.handle_exception(exc)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
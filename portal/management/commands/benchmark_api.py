@@ -0,0 +1,310 @@
+import itertools
+import json
+import platform
+import random
+import time
+import uuid
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from drugs.models import Drug
+from portal.changes import next_change_seq, record_deletions
+from portal.versions import bump_version_on_commit
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.rut import compute_verification_digit
+
+BENCHMARK_USERNAME = 'benchmark'
+CONTENT_TYPE = 'application/json'
+BULK_RECORDS = 50
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of the sorted list `values`.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(percent / 100 * len(values))) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every API endpoint in process and reports throughput, latency percentiles and "
+        "queries per request. Run `generate_data` first so the lists and lookups have realistic data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=10, help="Untimed requests per endpoint run first.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results as a JSON baseline to this file.")
+        parser.add_argument('--compare', help="Compare the results with a JSON baseline written by --output.")
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help="Percent of p95 latency or throughput change reported as a regression.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.client = Client(HTTP_HOST='127.0.0.1')
+        self.setup_user()
+        self.drug_ids = list(Drug.objects.values_list('id', flat=True))
+        if not self.drug_ids or not Vaccination.objects.exists():
+            raise CommandError("The benchmark needs drugs and vaccinations, run `generate_data` first.")
+        self.vaccination_ids = list(Vaccination.objects.order_by('-id').values_list('id', flat=True)[:1000])
+
+        self.bulk_last_id = None
+        results = {}
+        try:
+            for name, scenario in self.scenarios():
+                results[name] = self.run(scenario, options['requests'], options['warmup'])
+                self.stdout.write(self.format_result(name, results[name]))
+        finally:
+            if self.bulk_last_id is not None:
+                self.delete_vaccinations(self.bulk_last_id)
+
+        baseline = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'drugs': Drug.objects.count(),
+                'vaccinations': Vaccination.objects.count(),
+                'requests': options['requests'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(baseline, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.compare(json.load(previous), baseline, options['threshold'])
+
+    def setup_user(self):
+        self.password = uuid.uuid4().hex
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME)
+        user.set_password(self.password)
+        user.save()
+        resp = self.client.post(reverse('token_obtain_pair'), self.credentials(), content_type=CONTENT_TYPE)
+        self.access, self.refresh = resp.json()['access'], resp.json()['refresh']
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.access}'}
+
+    @staticmethod
+    def delete_vaccinations(last_id):
+        """
+        Deletes the vaccinations after `last_id` like their `delete()` would,
+        without a request per row.
+        """
+        with transaction.atomic():
+            change_seq = next_change_seq(Vaccination)
+            vaccinations = list(Vaccination.objects.filter(id__gt=last_id))
+            Vaccination.objects.filter(id__gt=last_id).delete()
+            record_deletions(Vaccination, [vaccination.id for vaccination in vaccinations], change_seq)
+            VaccinationDailyStat.objects.record(removed=[vaccination.stat_key for vaccination in vaccinations])
+            bump_version_on_commit(Vaccination.version_name)
+
+    def credentials(self):
+        return json.dumps({'username': BENCHMARK_USERNAME, 'password': self.password})
+
+    def scenarios(self):
+        """
+        `(name, scenario)` pairs. A scenario is a generator function that
+        prepares its data untimed and then yields one `(callable, expected
+        status)` per request.
+        """
+        client, headers = self.client, self.headers
+
+        def token_obtain():
+            while True:
+                yield lambda: client.post(reverse('token_obtain_pair'), self.credentials(),
+                                          content_type=CONTENT_TYPE), 200
+
+        def token_refresh():
+            data = json.dumps({'refresh': self.refresh})
+            while True:
+                yield lambda: client.post(reverse('token_refresh'), data, content_type=CONTENT_TYPE), 200
+
+        def token_verify():
+            data = json.dumps({'token': self.access})
+            while True:
+                yield lambda: client.post(reverse('token_verify'), data, content_type=CONTENT_TYPE), 200
+
+        def get(url):
+            return lambda: client.get(url, **headers)
+
+        def drugs_list():
+            while True:
+                yield get(reverse('drugs:list_create')), 200
+
+        def drugs_retrieve():
+            while True:
+                drug_id = self.rng.choice(self.drug_ids)
+                yield get(reverse('drugs:retrieve_update_delete', kwargs={'id': drug_id})), 200
+
+        # Create scenarios add the rows that the update and delete scenarios
+        # after them change and then remove again.
+        def drugs_create():
+            while True:
+                data = json.dumps({'name': 'Benchmark', 'code': 'B' + uuid.uuid4().hex[:9], 'description': 'bench'})
+                yield lambda: client.post(reverse('drugs:list_create'), data, content_type=CONTENT_TYPE,
+                                          **headers), 201
+
+        def drugs_update():
+            drug = Drug.objects.filter(name='Benchmark').first()
+            url = reverse('drugs:retrieve_update_delete', kwargs={'id': drug.id})
+            for n in itertools.count():
+                data = json.dumps({'name': 'Benchmark', 'code': drug.code, 'description': f'bench {n}'})
+                yield lambda: client.put(url, data, content_type=CONTENT_TYPE, **headers), 200
+
+        def drugs_delete():
+            for drug_id in Drug.objects.filter(name='Benchmark').values_list('id', flat=True):
+                url = reverse('drugs:retrieve_update_delete', kwargs={'id': drug_id})
+                yield lambda url=url: client.delete(url, **headers), 204
+
+        def vaccinations_list():
+            while True:
+                yield get(reverse('vaccinations:list_create')), 200
+
+        def vaccinations_retrieve():
+            while True:
+                vaccination_id = self.rng.choice(self.vaccination_ids)
+                yield get(reverse('vaccinations:retrieve_update_delete', kwargs={'id': vaccination_id})), 200
+
+        def vaccination_record():
+            rut_number = self.rng.randrange(1000000, 26000000)
+            return {
+                'rut': f'{rut_number}{compute_verification_digit(rut_number)}',
+                'dose': str(self.rng.randrange(15, 101) / 100),
+                'drug_id': self.rng.choice(self.drug_ids),
+            }
+
+        def vaccination_data():
+            return json.dumps(vaccination_record())
+
+        def vaccinations_create():
+            self.last_id = Vaccination.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+            while True:
+                data = vaccination_data()
+                yield lambda: client.post(reverse('vaccinations:list_create'), data, content_type=CONTENT_TYPE,
+                                          **headers), 201
+
+        def vaccinations_update():
+            vaccination = Vaccination.objects.filter(id__gt=self.last_id).first()
+            url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': vaccination.id})
+            while True:
+                data = vaccination_data()
+                yield lambda: client.put(url, data, content_type=CONTENT_TYPE, **headers), 200
+
+        def vaccinations_delete():
+            for vaccination_id in Vaccination.objects.filter(id__gt=self.last_id).values_list('id', flat=True):
+                url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': vaccination_id})
+                yield lambda url=url: client.delete(url, **headers), 204
+
+        def vaccinations_bulk():
+            self.bulk_last_id = Vaccination.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+            while True:
+                data = json.dumps([vaccination_record() for _ in range(BULK_RECORDS)])
+                yield lambda: client.post(reverse('vaccinations:bulk_create'), data, content_type=CONTENT_TYPE,
+                                          **headers), 201
+
+        def vaccinations_export():
+            # One drug and day per request: a full export per request would take minutes.
+            days = list(Vaccination.objects.filter(id__in=self.vaccination_ids).values_list('drug_id', 'date'))
+            while True:
+                drug_id, date = self.rng.choice(days)
+                day = timezone.localdate(date).isoformat()
+                url = reverse('vaccinations:export') + f'?drug={drug_id}&date_from={day}&date_to={day}'
+                yield lambda url=url: stream(client.get(url, **headers)), 200
+
+        def stream(resp):
+            b''.join(resp.streaming_content)
+            return resp
+
+        def vaccinations_stats():
+            while True:
+                yield get(reverse('vaccinations:stats')), 200
+
+        return [
+            ('token_obtain', token_obtain),
+            ('token_refresh', token_refresh),
+            ('token_verify', token_verify),
+            ('drugs:list', drugs_list),
+            ('drugs:retrieve', drugs_retrieve),
+            ('drugs:create', drugs_create),
+            ('drugs:update', drugs_update),
+            ('drugs:delete', drugs_delete),
+            ('vaccinations:list', vaccinations_list),
+            ('vaccinations:retrieve', vaccinations_retrieve),
+            ('vaccinations:create', vaccinations_create),
+            ('vaccinations:update', vaccinations_update),
+            ('vaccinations:delete', vaccinations_delete),
+            ('vaccinations:bulk', vaccinations_bulk),
+            ('vaccinations:export', vaccinations_export),
+            ('vaccinations:stats', vaccinations_stats),
+        ]
+
+    def run(self, scenario, requests, warmup):
+        latencies, queries, errors = [], 0, 0
+        started = time.perf_counter()
+        for n, (request, expected_status) in enumerate(scenario()):
+            if n >= requests + warmup:
+                break
+            with CaptureQueriesContext(connection) as context:
+                request_started = time.perf_counter()
+                resp = request()
+                elapsed = time.perf_counter() - request_started
+            if n < warmup:
+                started = time.perf_counter()
+                continue
+            latencies.append(elapsed)
+            queries += len(context.captured_queries)
+            errors += resp.status_code != expected_status
+        total = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / total, 1) if latencies else None,
+            'p50_ms': self.ms(percentile(latencies, 50)),
+            'p95_ms': self.ms(percentile(latencies, 95)),
+            'p99_ms': self.ms(percentile(latencies, 99)),
+            'queries': round(queries / len(latencies), 2) if latencies else None,
+        }
+
+    @staticmethod
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 2)
+
+    @staticmethod
+    def format_result(name, result):
+        columns = ['requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries']
+        return f'{name:<24}' + ' '.join(f'{column}={result[column]}' for column in columns)
+
+    def compare(self, previous, current, threshold):
+        regressions = []
+        for name, result in current['results'].items():
+            before = previous['results'].get(name)
+            if not before or not result['requests'] or not before['requests']:
+                continue
+            changes = []
+            for column in ['rps', 'p50_ms', 'p95_ms', 'queries']:
+                change = (result[column] - before[column]) / before[column] * 100 if before[column] else 0
+                changes.append(f'{column} {before[column]} -> {result[column]} ({change:+.0f}%)')
+                if column == 'rps' and change < -threshold or column == 'p95_ms' and change > threshold \
+                        or column == 'queries' and result[column] > before[column]:
+                    regressions.append(f'{name} {column}')
+            self.stdout.write(f'{name:<24}' + ', '.join(changes))
+
+        if regressions:
+            self.stdout.write(self.style.ERROR('Regressions: ' + ', '.join(regressions)))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
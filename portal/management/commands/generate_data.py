@@ -0,0 +1,81 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from drugs.cache import drug_cache
+from drugs.models import Drug
+from portal.changes import next_change_seq
+from portal.versions import bump_version
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.rut import compute_verification_digit
+
+DRUG_CODE_PREFIX = 'GEN'
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic drugs and vaccinations, with valid RUTs, for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drugs', type=int, default=20, help="Drugs to create.")
+        parser.add_argument('--vaccinations', type=int, default=10000, help="Vaccinations to create.")
+        parser.add_argument('--days', type=int, default=365,
+                            help="Spread vaccination dates over this many past days (0 keeps them all today).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, the same seed generates the same data.")
+        parser.add_argument('--batch-size', type=int, default=settings.VACCINATION_BULK_BATCH_SIZE,
+                            help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        last_code = Drug.objects.filter(code__startswith=DRUG_CODE_PREFIX).order_by('-code').values_list(
+            'code', flat=True).first()
+        first = int(last_code[len(DRUG_CODE_PREFIX):]) + 1 if last_code else 0
+        with transaction.atomic():
+            change_seq = next_change_seq(Drug)
+            Drug.objects.bulk_create([
+                Drug(name=f'Generated drug {n}', code=f'{DRUG_CODE_PREFIX}{n:07d}',
+                     description=f'Generated drug {n}', change_seq=change_seq)
+                for n in range(first, first + options['drugs'])
+            ], batch_size=batch_size)
+        drug_cache.invalidate()
+
+        drug_ids = list(Drug.objects.values_list('id', flat=True))
+        if options['vaccinations'] and not drug_ids:
+            raise CommandError("There are no drugs to vaccinate with, use --drugs.")
+
+        now = timezone.now()
+        remaining = options['vaccinations']
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            last_id = Vaccination.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+            Vaccination.objects.bulk_ingest([self.vaccination(rng, drug_ids) for _ in range(count)])
+            if options['days']:
+                # `date` is set on insert, so each batch is moved to its own day afterwards.
+                date = now - timedelta(days=rng.randrange(options['days']), seconds=rng.randrange(86400))
+                Vaccination.objects.filter(id__gt=last_id).update(date=date)
+            remaining -= count
+
+        if options['days'] and options['vaccinations']:
+            VaccinationDailyStat.objects.rebuild()
+            bump_version(Vaccination.version_name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['drugs']} drugs and {options['vaccinations']} vaccinations."
+        ))
+
+    @staticmethod
+    def vaccination(rng, drug_ids):
+        rut_number = rng.randrange(1000000, 26000000)
+        return Vaccination(
+            rut_number=rut_number,
+            rut_dv=compute_verification_digit(rut_number),
+            dose=Decimal(rng.randrange(15, 101)) / 100,
+            drug_id=rng.choice(drug_ids),
+        )
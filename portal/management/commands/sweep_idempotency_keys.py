@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from portal.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Deletes expired idempotency keys. On App Engine the cron job in cron.yaml does it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Keys deleted per query.")
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.objects.sweep(batch_size=options['batch_size'])
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys.")
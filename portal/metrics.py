@@ -0,0 +1,139 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Every process (App Engine instance, gunicorn worker) keeps its own counters
+and histograms, Prometheus tells them apart by instance when scraping.
+"""
+import bisect
+import threading
+
+# Request latency buckets in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"') for _, value in pairs)
+    return '{%s}' % ','.join('%s="%s"' % (name, value) for (name, _), value in zip(pairs, escaped))
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket (non cumulative, last one is +Inf), sum]
+        self._values = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts_sum = self._values.get(labels)
+            if counts_sum is None:
+                counts_sum = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts_sum[0][index] += 1
+            counts_sum[1] += value
+
+    def get_count(self, labels=()):
+        counts_sum = self._values.get(labels)
+        return sum(counts_sum[0]) if counts_sum else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _format_value(float(bound))
+                yield self.name + '_bucket', _format_labels(self.labelnames, labels, [('le', le)]), cumulative
+            yield self.name + '_sum', _format_labels(self.labelnames, labels), total
+            yield self.name + '_count', _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            for name, labels, value in metric.samples():
+                lines.append('%s%s %s' % (name, labels, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'portal_request_duration_seconds', 'Time to serve a request, by URL name and method.', ['view', 'method'],
+))
+request_db_duration = registry.register(Histogram(
+    'portal_request_db_duration_seconds', 'Time spent in database queries per request, by URL name.', ['view'],
+))
+request_serialize_duration = registry.register(Histogram(
+    'portal_request_serialize_duration_seconds', 'Time spent serializing and rendering per request, by URL name.',
+    ['view'],
+))
+requests_total = registry.register(Counter(
+    'portal_requests_total', 'Requests served, by URL name, method and status code.', ['view', 'method', 'status'],
+))
+request_db_queries = registry.register(Counter(
+    'portal_request_db_queries_total', 'Database queries run, by URL name.', ['view'],
+))
+db_connections_opened = registry.register(Counter(
+    'portal_db_connections_opened_total', 'Database connections opened, by database alias.', ['database'],
+))
+db_connections_reused = registry.register(Counter(
+    'portal_db_connections_reused_total', 'Requests served on a connection kept from an earlier request, by '
+    'database alias.', ['database'],
+))
+db_connection_failures = registry.register(Counter(
+    'portal_db_connection_failures_total', 'Kept connections that failed their health check and were closed, by '
+    'database alias.', ['database'],
+))
+group_commit_rows = registry.register(Histogram(
+    'portal_group_commit_rows', 'Rows written per group commit, by committer.', ['committer'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+))
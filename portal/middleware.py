@@ -0,0 +1,78 @@
+import time
+
+from portal import metrics
+from portal.timing import RequestTiming
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class RequestTimingMiddleware:
+    """
+    Times every request and reports the breakdown in a `Server-Timing` header
+    and in the per URL name histograms of `portal.metrics`.
+
+    Phases: `auth` (JWT authentication), `db` (all queries), `serialize`
+    (serializers), `view` (the whole view, including auth, db and serialize),
+    `render` (rendering a DRF response after the view) and `total`. Must be the
+    first middleware so `total` covers the others.
+
+    For streaming responses only the time to start the stream is measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        request.timing = timing
+        token = timing.activate()
+        try:
+            response = self.get_response(request)
+        finally:
+            RequestTiming.deactivate(token)
+        ended = time.perf_counter()
+
+        view_started = getattr(request, '_timing_view_started', None)
+        if view_started is not None and 'view' not in timing.durations:
+            timing.add('view', ended - view_started)
+        total = ended - timing.started
+
+        response['Server-Timing'] = self.server_timing(timing, total)
+        self.observe(request, response, timing, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, so the view ends here.
+        ended = time.perf_counter()
+        request.timing.add('view', ended - request._timing_view_started)
+        response.add_post_render_callback(
+            lambda rendered: request.timing.add('render', time.perf_counter() - ended)
+        )
+        return response
+
+    @staticmethod
+    def server_timing(timing, total):
+        entries = []
+        for name, seconds in timing.durations.items():
+            entry = '%s;dur=%.2f' % (name, seconds * 1000)
+            if name == 'db':
+                entry += ';desc="%d queries"' % timing.queries
+            entries.append(entry)
+        entries.append('total;dur=%.2f' % (total * 1000))
+        return ', '.join(entries)
+
+    @staticmethod
+    def observe(request, response, timing, total):
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED_VIEW
+        metrics.request_duration.observe((view, request.method), total)
+        metrics.requests_total.inc((view, request.method, str(response.status_code)))
+        if match is not None:
+            metrics.request_db_duration.observe((view,), timing.durations.get('db', 0.0))
+            metrics.request_serialize_duration.observe(
+                (view,), timing.durations.get('serialize', 0.0) + timing.durations.get('render', 0.0)
+            )
+            metrics.request_db_queries.inc((view,), timing.queries)
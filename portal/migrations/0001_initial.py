@@ -0,0 +1,34 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:00
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Key')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Request fingerprint')),
+                ('status_code', models.PositiveSmallIntegerField(null=True, verbose_name='Status code')),
+                ('response', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Response')),
+                ('expires', models.DateTimeField(db_index=True, verbose_name='Expires')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotency_key_user_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Object id')),
+                ('change_seq', models.BigIntegerField(verbose_name='Change sequence')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'change_seq', 'object_id'], name='tombstone_model_seq_idx'),
+        ),
+    ]
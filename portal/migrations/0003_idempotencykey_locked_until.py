@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_changesequence_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(null=True, verbose_name='Locked until'),
+        ),
+    ]
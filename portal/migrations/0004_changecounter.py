@@ -0,0 +1,34 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:43
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def start_counter(apps, schema_editor):
+    # Carries on after the last number the sequence table handed out.
+    ChangeCounter = apps.get_model('portal', 'ChangeCounter')
+    ChangeSequence = apps.get_model('portal', 'ChangeSequence')
+    db_alias = schema_editor.connection.alias
+    last = ChangeSequence.objects.using(db_alias).aggregate(last=Max('id'))['last'] or 0
+    ChangeCounter.objects.using(db_alias).create(id=1, value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_idempotencykey_locked_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Value')),
+            ],
+        ),
+        migrations.RunPython(start_counter, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ChangeSequence',
+        ),
+    ]
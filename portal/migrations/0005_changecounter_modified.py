@@ -0,0 +1,19 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_changecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changecounter',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Modified'),
+        ),
+    ]
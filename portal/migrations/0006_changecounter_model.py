@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+# Models with a change feed when the counter was split.
+MODELS = ['drugs.drug', 'vaccinations.vaccination']
+
+
+def split_counter(apps, schema_editor):
+    # Every model carries on after the last number of the shared counter, so
+    # cursors held by clients stay behind every new change.
+    ChangeCounter = apps.get_model('portal', 'ChangeCounter')
+    db_alias = schema_editor.connection.alias
+    shared = ChangeCounter.objects.using(db_alias).filter(model__isnull=True).order_by('-value').first()
+    if shared is None:
+        return
+    ChangeCounter.objects.using(db_alias).bulk_create([
+        ChangeCounter(model=model, value=shared.value, modified=shared.modified) for model in MODELS
+    ])
+    ChangeCounter.objects.using(db_alias).filter(model__isnull=True).delete()
+
+
+def merge_counters(apps, schema_editor):
+    ChangeCounter = apps.get_model('portal', 'ChangeCounter')
+    db_alias = schema_editor.connection.alias
+    last = ChangeCounter.objects.using(db_alias).order_by('-value').first()
+    if last is None:
+        return
+    ChangeCounter.objects.using(db_alias).exclude(id=last.id).delete()
+    ChangeCounter.objects.using(db_alias).filter(id=last.id).update(id=1, model=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_changecounter_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changecounter',
+            name='model',
+            field=models.CharField(max_length=100, null=True, verbose_name='Model'),
+        ),
+        migrations.RunPython(split_counter, merge_counters),
+        migrations.AlterField(
+            model_name='changecounter',
+            name='model',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Model'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from django.utils.translation import ugettext_lazy as _
+
+
+class IdempotencyKeyManager(models.Manager):
+
+    def claim(self, user, key, fingerprint):
+        """
+        Returns `(record, True)` after storing `key` for a new request of `user`,
+        or `(record, False)` with the unexpired record of an earlier request
+        with the same key. The record is None if that request has just released
+        the key.
+
+        An earlier identical request that stored no response within its lease
+        is taken to have died: the key is handed over with a new lease.
+        """
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_LEASE)
+        record = self.filter(user=user, key=key).first()
+        if record is not None:
+            if record.expires <= now:
+                record.delete()
+            elif record.status_code is None and record.fingerprint == fingerprint \
+                    and (record.locked_until is None or record.locked_until <= now):
+                # Only one retry wins the lease when several race for it.
+                taken = self.filter(id=record.id, status_code__isnull=True,
+                                    locked_until=record.locked_until).update(locked_until=locked_until)
+                record.locked_until = locked_until
+                return record, bool(taken)
+            else:
+                return record, False
+        try:
+            with transaction.atomic(using=self.db):
+                return self.create(user=user, key=key, fingerprint=fingerprint, locked_until=locked_until,
+                                   expires=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)), True
+        except IntegrityError:
+            # A concurrent request with the same key claimed it first.
+            return self.filter(user=user, key=key).first(), False
+
+    def sweep(self, batch_size=1000):
+        """
+        Deletes expired keys in batches of `batch_size` and returns how many
+        were deleted.
+        """
+        deleted = 0
+        while True:
+            ids = list(self.filter(expires__lte=timezone.now()).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += self.filter(id__in=ids).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a create request sent with an `Idempotency-Key` header,
+    replayed to retries with the same key until `expires`. `status_code` is
+    null while the first request is still being processed, which it may be
+    until `locked_until`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(verbose_name=_("Key"), max_length=255)
+    fingerprint = models.CharField(verbose_name=_("Request fingerprint"), max_length=64)
+    status_code = models.PositiveSmallIntegerField(verbose_name=_("Status code"), null=True)
+    response = models.JSONField(verbose_name=_("Response"), null=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField(verbose_name=_("Locked until"), null=True)
+    expires = models.DateTimeField(verbose_name=_("Expires"), db_index=True)
+
+    objects = IdempotencyKeyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_user_key_uniq'),
+        ]
+
+
+class ChangeCounter(models.Model):
+    """
+    The last change sequence number taken for a model and when, see
+    `portal.changes`.
+    """
+    model = models.CharField(verbose_name=_("Model"), max_length=100, unique=True)
+    value = models.BigIntegerField(verbose_name=_("Value"), default=0)
+    modified = models.DateTimeField(verbose_name=_("Modified"), default=timezone.now)
+
+
+class Tombstone(models.Model):
+    """
+    A deleted object, kept for the change feed of its model.
+    """
+    model = models.CharField(verbose_name=_("Model"), max_length=100)
+    object_id = models.PositiveIntegerField(verbose_name=_("Object id"))
+    change_seq = models.BigIntegerField(verbose_name=_("Change sequence"))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'change_seq', 'object_id'], name='tombstone_model_seq_idx'),
+        ]
@@ -0,0 +1,183 @@
+"""
+Keyset (cursor) pagination for the API list endpoints.
+
+Pages are addressed by the ordering keys of the row they start after, so every
+page is a bounded index seek: no OFFSET scan and no COUNT(*) per request.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination keyed on a tuple of columns that is unique per row.
+
+    `ordering` must end with a unique column (usually `id`) so the position of
+    every row is unambiguous. Cursors are opaque base64 tokens holding the
+    key values of the boundary row and the paging direction.
+
+    Besides querysets, in-memory sequences of model instances (such as cached
+    catalogs) can be paginated with the same cursors.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        model = queryset.model if isinstance(queryset, QuerySet) else view.get_queryset().model
+        self.fields = [model._meta.get_field(key.lstrip('-')) for key in self.ordering]
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        if isinstance(queryset, QuerySet):
+            results = self.seek_queryset(queryset, reverse)
+        else:
+            results = self.seek_sequence(queryset, reverse)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def seek_queryset(self, queryset, reverse):
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(self.cursor.position, reverse))
+        return list(queryset[:self.page_size + 1])
+
+    def seek_sequence(self, rows, reverse):
+        order_by = self.get_order_by(reverse)
+        for index in reversed(range(len(order_by))):
+            rows = sorted(rows, key=lambda row: self.get_position(row)[index], reverse=order_by[index].startswith('-'))
+        if self.cursor is not None:
+            rows = [row for row in rows if self.is_after(self.get_position(row), self.cursor.position, order_by)]
+        return rows[:self.page_size + 1]
+
+    @staticmethod
+    def is_after(position, other, order_by):
+        for value, other_value, key in zip(position, other, order_by):
+            if value != other_value:
+                return value < other_value if key.startswith('-') else value > other_value
+        return False
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                pass
+            else:
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+        return self.page_size
+
+    def get_order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return [key[1:] if key.startswith('-') else '-' + key for key in self.ordering]
+
+    def get_seek_filter(self, position, reverse):
+        """
+        Rows strictly after `position` in the paging direction, expressed as the
+        lexicographic comparison `(k1, k2, ...) > (v1, v2, ...)`.
+        """
+        seek = Q()
+        for index, key in enumerate(self.ordering):
+            descending = key.startswith('-') != reverse
+            lookup = '%s__%s' % (key.lstrip('-'), 'lt' if descending else 'gt')
+            equal = {other.lstrip('-'): position[i] for i, other in enumerate(self.ordering[:index])}
+            seek |= Q(**equal, **{lookup: position[index]})
+        return seek
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            return [row[field.attname] for field in self.fields]
+        return [getattr(row, field.attname) for field in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(reverse=False, position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(reverse=True, position=self.get_position(self.page[0])))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return Cursor(reverse=bool(payload.get('r')), position=position)
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        payload = {'p': [self._dump_value(value) for value in cursor.position]}
+        if cursor.reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
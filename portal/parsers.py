@@ -0,0 +1,64 @@
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import json
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list with one item per non-blank line.
+    """
+    media_type = 'application/x-ndjson'
+    strict = api_settings.STRICT_JSON
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        parse_constant = json.strict_constant if self.strict else None
+
+        records = []
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line.decode(encoding), parse_constant=parse_constant))
+            except ValueError as exc:
+                raise ParseError('NDJSON parse error on line %d - %s' % (number, str(exc)))
+        return records
+
+
+# Integers orjson might not read exactly (over 64 bits) have at least 19 digits.
+# Mapping digits to b'0' and everything else to b' ' finds them much faster
+# than a regular expression.
+DIGITS = bytes(b'0'[0] if b'0'[0] <= byte <= b'9'[0] else b' '[0] for byte in range(256))
+LONG_NUMBER = b'0' * 19
+
+
+class ORJSONParser(JSONParser):
+    """
+    `JSONParser` on top of orjson.
+
+    orjson only reads UTF-8, rejects NaN/Infinity and does not keep integers
+    over 64 bits, so other encodings, bodies with such long numbers and anything
+    orjson fails on go through the stock parser, which accepts the same
+    documents and reports errors the same way.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read() if stream is not None else b''
+        if LONG_NUMBER in body.translate(DIGITS):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,38 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` on top of orjson, with the same output.
+
+    Types orjson does not handle the way DRF does (datetimes, decimals, lazy
+    strings...) are passed to DRF's encoder. Indented output, ASCII-only output
+    and anything orjson cannot encode (integers over 64 bits, dictionaries with
+    keys that are not strings) are left to the stock renderer.
+
+    The API itself never emits floats: orjson and `json` spell some of them
+    differently (`1e16` and `1e+16`) and orjson writes NaN as null.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Like JSONRenderer, keep the output a strict javascript subset. U+2028
+        # and U+2029 start with 0xe2 in UTF-8, and a single byte is much faster
+        # to look for.
+        if b'\xe2' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,84 @@
+"""
+Read replica routing.
+
+Views using `ReplicaReadMixin` run their GET/HEAD handlers against one of the
+read replicas in `settings.DATABASE_REPLICAS`. Everything else, writes and the
+reads they make, stays on the primary (`default`).
+
+Replicas lag behind the primary, so a user who writes is pinned to the primary
+for `settings.REPLICA_PIN_SECONDS` and sees their own writes on their next
+reads. Pins are kept in the shared cache, so they hold on every instance.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'portal:primary_pin:%s'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_read_alias():
+    """
+    The replica the current request reads from, or None for the primary.
+    """
+    return _read_alias.get()
+
+
+def pin_to_primary(user):
+    cache.set(PIN_KEY % user.pk, True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return cache.get(PIN_KEY % user.pk) is not None
+
+
+class ReplicaRouter:
+    """
+    Sends reads of the API apps to the replica chosen for the current request.
+    Other apps (auth, the database cache holding pins and version stamps) are
+    always read from the primary.
+    """
+    app_labels = {'drugs', 'vaccinations'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.app_labels:
+            return get_read_alias()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Reads GET/HEAD requests from a random replica, unless the user is pinned to
+    the primary, and pins users after every successful write.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and request.method in SAFE_METHODS:
+            if not (request.user.is_authenticated and is_pinned_to_primary(request.user)):
+                _read_alias.set(random.choice(replicas))
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+        request = self.request
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+            if request.user.is_authenticated:
+                pin_to_primary(request.user)
+        return response
@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from portal.timing import timed
+
+
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent building `.data` to the `serialize` phase of the request
+    timing. Set `list_serializer_class = TimedListSerializer` in `Meta` to time
+    `many=True` serializers as well.
+    """
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
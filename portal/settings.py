@@ -44,6 +44,7 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    "portal.apps.PortalConfig",
     "drugs.apps.DrugsConfig",
     "vaccinations.apps.VaccinationsConfig"
 ]
@@ -51,6 +52,7 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'portal.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,7 +62,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'portal.urls'
+# portal/asgi.py sets PORTAL_ASGI to route reads to the async views.
+ROOT_URLCONF = 'portal.urls_asgi' if os.getenv('PORTAL_ASGI', False) else 'portal.urls'
 
 TEMPLATES = [
     {
@@ -79,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'portal.wsgi.application'
+ASGI_APPLICATION = 'portal.asgi.application'
 
 
 # Database
@@ -96,13 +100,25 @@ if os.getenv('GAE_APPLICATION', None):
             'PASSWORD': 'api-testing',
         }
     }
+    # Cloud SQL read replicas, as a comma separated list of unix sockets.
+    for number, host in enumerate(filter(None, os.getenv('PORTAL_DB_REPLICA_HOSTS', '').split(',')), 1):
+        DATABASES[f'replica{number}'] = dict(DATABASES['default'], HOST=host)
+    DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
 elif os.getenv('PORTAL_LOCAL', False):
+    # A second SQLite file stands in for a replica: it only holds what is
+    # copied from db.sqlite3, so it lags until the next copy. Reads use it
+    # with PORTAL_LOCAL_REPLICA set.
     DATABASES = {
         'default': {
          'ENGINE': 'django.db.backends.sqlite3',
          'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-        }
+        },
+        'replica': {
+         'ENGINE': 'django.db.backends.sqlite3',
+         'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+        },
     }
+    DATABASE_REPLICAS = ['replica'] if os.getenv('PORTAL_LOCAL_REPLICA', False) else []
 else:
     DATABASES = {
         'default': {
@@ -113,6 +129,35 @@ else:
             'PASSWORD': 'api-testing',
         }
     }
+    DATABASE_REPLICAS = []
+
+# Connections are kept open for at most PORTAL_DB_CONN_MAX_AGE seconds and
+# health checked before a request reuses them once they have been idle for
+# DB_CONN_HEALTH_CHECK_IDLE seconds, see portal/connections.py.
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE', int(os.getenv('PORTAL_DB_CONN_MAX_AGE', 300)))
+DB_CONN_HEALTH_CHECKS = True
+DB_CONN_HEALTH_CHECK_IDLE = 30
+
+# GET handlers of the API read from DATABASE_REPLICAS, see portal/replicas.py.
+# Users are pinned to the primary for REPLICA_PIN_SECONDS after writing, which
+# must exceed the replication lag.
+DATABASE_ROUTERS = ['portal.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Version stamps kept in the cache must be shared by every instance, so App
+# Engine uses the database cache (python manage.py createcachetable).
+
+if os.getenv('GAE_APPLICATION', None):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'portal_cache',
+        }
+    }
 
 
 # Password validation
@@ -156,6 +201,55 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'portal.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'portal.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'portal.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'portal.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 100,
 }
+
+
+# Authenticated users are cached per process for at most this many seconds, so a
+# deactivated user is locked out of every instance within that time.
+JWT_USER_CACHE_TTL = 60
+JWT_USER_CACHE_SIZE = 1024
+
+# Seconds the drug cache serves its copy before reading the shared version
+# stamp again. Drug changes made by other processes show up this much later.
+DRUG_CACHE_VERSION_TTL = 1.0
+
+# Responses to create requests with an Idempotency-Key header are replayed to
+# retries for this many seconds. A request holds its key for at most
+# IDEMPOTENCY_KEY_LEASE seconds: if it has not stored a response by then (its
+# process died or timed out), a retry with the key runs the request again.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_KEY_LEASE = 60
+
+# Most keys in one batch retrieve (?ids= on vaccinations, ?codes= on drugs).
+BATCH_RETRIEVE_MAX_KEYS = 500
+
+# Bulk vaccination ingest: maximum records per request and rows per INSERT.
+VACCINATION_BULK_MAX_RECORDS = 5000
+VACCINATION_BULK_BATCH_SIZE = 500
+
+# Group commit of single vaccination creates (PORTAL_GROUP_COMMIT): concurrent
+# creates in a process are written with one INSERT and commit, at most
+# MAX_ROWS rows and MAX_DELAY seconds after the first one.
+VACCINATION_GROUP_COMMIT = bool(os.getenv('PORTAL_GROUP_COMMIT', False))
+VACCINATION_GROUP_COMMIT_MAX_ROWS = 100
+VACCINATION_GROUP_COMMIT_MAX_DELAY = 0.005
+
+# Rows fetched per query when streaming vaccination exports.
+VACCINATION_EXPORT_CHUNK_SIZE = 2000
+
+# Bearer token Prometheus must send to scrape /metrics. The endpoint is
+# disabled when it is not set.
+METRICS_TOKEN = os.getenv('PORTAL_METRICS_TOKEN', None)
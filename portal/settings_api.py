@@ -0,0 +1,50 @@
+"""
+API-only settings for portal project, used on App Engine (see app.yaml).
+
+The API authenticates with JWT only and serves JSON, so the admin, sessions,
+messages, static files, templates and the middleware that goes with them are
+dropped: none of it is imported on a cold start or run on each request.
+"""
+
+from portal.settings import *  # noqa: F401,F403
+from portal.settings import INSTALLED_APPS, REST_FRAMEWORK
+
+UNUSED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in UNUSED_APPS]
+
+# DRF sets request.user from the JWT itself, and nothing reads sessions,
+# messages or CSRF cookies.
+MIDDLEWARE = [
+    'portal.middleware.RequestTimingMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+# The browsable API needs templates and static files.
+REST_FRAMEWORK = dict(REST_FRAMEWORK, DEFAULT_RENDERER_CLASSES=(
+    'portal.renderers.ORJSONRenderer',
+))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'portal.startup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
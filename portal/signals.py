@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from portal import metrics
+from portal.authentication import user_cache
+from portal.connections import check_connections, release_connections
+from portal.startup import startup_timer
+from portal.timing import record_query
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+@receiver(request_started)
+def start_request_timer(sender, **kwargs):
+    startup_timer.start_request()
+
+
+@receiver(request_finished)
+def finish_request_timer(sender, **kwargs):
+    startup_timer.finish_request()
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def count_connection_opened(sender, connection, **kwargs):
+    metrics.db_connections_opened.inc((connection.alias,))
+
+
+# Runs after Django's own request_started handler has closed the obsolete
+# connections.
+@receiver(request_started)
+def check_kept_connections(sender, **kwargs):
+    check_connections()
+
+
+@receiver(request_finished)
+def release_kept_connections(sender, **kwargs):
+    release_connections()
@@ -0,0 +1,79 @@
+"""
+Cold start timing.
+
+`portal.wsgi` and `portal.asgi` import this module before anything else, so
+its import time is the origin the boot phases are measured from: Django setup
+(settings, app and model imports), then handler and middleware loading. The
+App Engine warmup request and the first request served add their own phases,
+and once the first request finishes the whole breakdown is logged to the
+`portal.startup` logger.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.last = self.origin
+        self.phases = []
+        self.first_request_started = None
+        self.first_request_done = False
+
+    def mark(self, name):
+        """
+        Records the time since the previous mark (or since the import of this
+        module) as the boot phase `name`.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            self.phases.append((name, now - self.last))
+            self.last = now
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Records the time spent in the block as phase `name`.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.last = time.perf_counter()
+                self.phases.append((name, self.last - started))
+
+    def start_request(self):
+        with self._lock:
+            if self.first_request_started is None:
+                self.first_request_started = time.perf_counter()
+
+    def finish_request(self):
+        with self._lock:
+            if self.first_request_done or self.first_request_started is None:
+                return
+            self.first_request_done = True
+            self.last = time.perf_counter()
+            self.phases.append(('first_request', self.last - self.first_request_started))
+        logger.info('cold start: %s', self.format())
+
+    def report(self):
+        phases = [{'name': name, 'ms': round(seconds * 1000, 2)} for name, seconds in self.phases]
+        return {
+            'phases': phases,
+            'total_ms': round(sum(seconds for _, seconds in self.phases) * 1000, 2),
+        }
+
+    def format(self):
+        report = self.report()
+        phases = ' '.join('%s=%.1fms' % (phase['name'], phase['ms']) for phase in report['phases'])
+        return '%s total=%.1fms' % (phases, report['total_ms'])
+
+
+startup_timer = StartupTimer()
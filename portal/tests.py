@@ -0,0 +1,532 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from drugs.models import Drug
+from portal import metrics
+from portal.authentication import user_cache
+from portal.connections import check_connections, release_connections
+from portal.group_commit import GroupCommitter
+from portal.models import IdempotencyKey
+from portal.parsers import ORJSONParser
+from portal.renderers import ORJSONRenderer
+from portal.replicas import PIN_KEY
+from portal.startup import StartupTimer
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.rut import compute_verification_digit
+
+
+class PortalSetUp(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.content_type = 'application/json'
+
+        self.user_username = "user_test"
+        self.user_email = "user_test@test.cl"
+        self.user_password = "top_secret"
+        self.user = User.objects.create(username=self.user_username, email=self.user_email)
+        self.user.set_password(self.user_password)
+        self.user.save()
+
+        login_data = json.dumps({'username': self.user_username, 'password': self.user_password})
+        resp = self.client.post(reverse('token_obtain_pair'), login_data, content_type=self.content_type)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.token = resp.data.get('access', None)
+
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+
+
+class TestCachedJWTAuthentication(PortalSetUp):
+
+    def get_drugs(self):
+        return self.client.get(reverse('drugs:list_create'), content_type=self.content_type, **self.headers)
+
+    def test_user_cached(self):
+        self.assertEqual(self.get_drugs().status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_drugs().status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.get_drugs().status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_drugs().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_by_another_process(self):
+        self.assertEqual(self.get_drugs().status_code, status.HTTP_200_OK)
+
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertEqual(self.get_drugs().status_code, status.HTTP_200_OK)
+
+        ttl = user_cache.ttl
+        user_cache.ttl = 0
+        try:
+            self.assertEqual(self.get_drugs().status_code, status.HTTP_401_UNAUTHORIZED)
+        finally:
+            user_cache.ttl = ttl
+
+
+class TestRequestTiming(PortalSetUp):
+
+    def setUp(self):
+        super().setUp()
+        drug = Drug.objects.create(name='Drug1', code='drug1', description='drug1')
+        Vaccination.objects.create(rut='115417479', dose='0.15', drug=drug)
+        # Caches the request user.
+        self.client.get(reverse('vaccinations:list_create'), **self.headers)
+
+    def test_server_timing(self):
+        resp = self.client.get(reverse('vaccinations:list_create'), **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        entries = dict(entry.split(';', 1) for entry in resp['Server-Timing'].split(', '))
+        self.assertEqual(set(entries), {'auth', 'db', 'serialize', 'view', 'render', 'total'})
+        self.assertIn('desc="1 queries"', entries['db'])
+
+    def test_histograms(self):
+        labels = ('vaccinations:list_create', 'GET')
+        count = metrics.request_duration.get_count(labels)
+        queries = metrics.request_db_queries.get(labels[:1])
+        self.client.get(reverse('vaccinations:list_create'), **self.headers)
+        self.client.get(reverse('vaccinations:list_create'), **self.headers)
+        self.assertEqual(metrics.request_duration.get_count(labels), count + 2)
+        self.assertEqual(metrics.request_db_queries.get(labels[:1]), queries + 2)
+
+    def test_metrics_endpoint(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.settings(METRICS_TOKEN='scrape'):
+            self.assertEqual(self.client.get(reverse('metrics'), **self.headers).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+            self.client.get(reverse('vaccinations:list_create'), **self.headers)
+            resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertTrue(resp['Content-Type'].startswith('text/plain; version=0.0.4'))
+            body = resp.content.decode()
+            self.assertIn('# TYPE portal_request_duration_seconds histogram', body)
+            self.assertIn('portal_request_duration_seconds_bucket'
+                          '{view="vaccinations:list_create",method="GET",le="+Inf"}', body)
+
+    def test_histogram_buckets(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ['view'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(('a',), value)
+        samples = {name + labels: value for name, labels, value in histogram.samples()}
+        self.assertEqual(samples['test_seconds_bucket{view="a",le="0.1"}'], 1)
+        self.assertEqual(samples['test_seconds_bucket{view="a",le="1.0"}'], 3)
+        self.assertEqual(samples['test_seconds_bucket{view="a",le="+Inf"}'], 4)
+        self.assertEqual(samples['test_seconds_count{view="a"}'], 4)
+        self.assertAlmostEqual(samples['test_seconds_sum{view="a"}'], 6.25)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class TestReadReplicaRouting(PortalSetUp):
+    """
+    The replica is a second SQLite database that nothing is replicated to, so
+    every response shows which database it was read from.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        self.drug = Drug.objects.create(name='Drug1', code='drug1', description='drug1')
+        Drug.objects.using('replica').create(id=self.drug.id, name='Drug1', code='drug1', description='drug1')
+        self.primary_vaccination = Vaccination.objects.create(rut='115417479', dose='0.15', drug=self.drug)
+        self.replica_vaccination = Vaccination.objects.using('replica').create(
+            id=self.primary_vaccination.id + 1000, rut='123456785', dose='0.25', drug_id=self.drug.id
+        )
+        self.url = reverse('vaccinations:list_create')
+
+    def get_ruts(self, headers):
+        resp = self.client.get(self.url, **headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [vaccination['rut'] for vaccination in resp.data['results']]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.get_ruts(self.headers), ['12.345.678-5'])
+
+        url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.replica_vaccination.id})
+        self.assertEqual(self.client.get(url, **self.headers).status_code, status.HTTP_200_OK)
+
+    def test_writes_pin_to_primary(self):
+        other_token = RefreshToken.for_user(User.objects.create(username='other')).access_token
+        other_headers = {'HTTP_AUTHORIZATION': f'Bearer {other_token}'}
+
+        resp = self.client.post(self.url, {'rut': '115417479', 'dose': '0.50', 'drug_id': self.drug.id},
+                                content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Vaccination.objects.using('replica').count(), 1)
+
+        self.assertEqual(self.get_ruts(self.headers), ['11.541.747-9', '11.541.747-9'])
+        self.assertEqual(self.get_ruts(other_headers), ['12.345.678-5'])
+
+        cache.delete(PIN_KEY % self.user.pk)
+        self.assertEqual(self.get_ruts(self.headers), ['12.345.678-5'])
+
+    def test_failed_write_does_not_pin(self):
+        resp = self.client.post(self.url, {'rut': '11541747k', 'dose': '0.50', 'drug_id': self.drug.id},
+                                content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_ruts(self.headers), ['12.345.678-5'])
+
+    def test_validators_follow_replica(self):
+        resp = self.client.get(self.url, **self.headers)
+        etag = resp['ETag']
+
+        # The primary moves on while the replica lags: the replica's copy is
+        # still current.
+        Vaccination.objects.create(rut='123456785', dose='0.50', drug=self.drug)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # The replica catches up.
+        Vaccination.objects.using('replica').create(
+            id=self.primary_vaccination.id + 1001, rut='115417479', dose='0.50', drug_id=self.drug.id
+        )
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 2)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_drug_validators_follow_replica(self):
+        url = reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id})
+        resp = self.client.get(url, **self.headers)
+        etag = resp['ETag']
+
+        # Renamed on the primary only: the replica's row is stale but still
+        # matches its ETag.
+        self.drug.name = 'Drug2'
+        self.drug.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        resp = self.client.get(url, **self.headers)
+        self.assertEqual((resp.data['name'], resp['ETag']), ('Drug1', etag))
+
+        replica_drug = Drug.objects.using('replica').get(id=self.drug.id)
+        replica_drug.name = 'Drug2'
+        replica_drug.save(using='replica')
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['name'], 'Drug2')
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_export_reads_from_replica(self):
+        resp = self.client.get(reverse('vaccinations:export'), **self.headers)
+        rows = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+        self.assertEqual([row['rut'] for row in rows], ['12.345.678-5'])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(list(Vaccination.objects.values_list('id', flat=True)), [self.primary_vaccination.id])
+
+
+class TestPersistentConnections(TestCase):
+
+    def test_settings(self):
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 300)
+
+    def test_reused(self):
+        connection.ensure_connection()
+        reused = metrics.db_connections_reused.get(('default',))
+        check_connections()
+        self.assertEqual(metrics.db_connections_reused.get(('default',)), reused + 1)
+
+    def test_failed_health_check(self):
+        connection.ensure_connection()
+        failures = metrics.db_connection_failures.get(('default',))
+        closed = []
+        connection.is_usable = lambda: False
+        connection.close = lambda: closed.append(True)
+        try:
+            # Recently used connections are not checked.
+            release_connections()
+            check_connections()
+            self.assertEqual(closed, [])
+
+            connection.portal_released -= settings.DB_CONN_HEALTH_CHECK_IDLE
+            check_connections()
+        finally:
+            del connection.is_usable
+            del connection.close
+        self.assertEqual(closed, [True])
+        self.assertEqual(metrics.db_connection_failures.get(('default',)), failures + 1)
+
+    def test_opened(self):
+        opened = metrics.db_connections_opened.get(('default',))
+        other = connection.copy()
+        other.ensure_connection()
+        other.close()
+        self.assertEqual(metrics.db_connections_opened.get(('default',)), opened + 1)
+
+
+class TestIdempotencyKeySweep(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username="user_test")
+        now = timezone.now()
+        for key, expires in (('expired', now - timedelta(seconds=1)), ('live', now + timedelta(hours=1))):
+            IdempotencyKey.objects.create(user=user, key=key, fingerprint='', expires=expires)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('sweep_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['live'])
+
+    def test_cron_view(self):
+        self.assertEqual(self.client.get(reverse('sweep_idempotency_keys')).status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.get(reverse('sweep_idempotency_keys'), HTTP_X_APPENGINE_CRON='true')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json(), {'deleted': 1})
+
+
+class TestGroupCommitter(TestCase):
+
+    def flush(self, items):
+        self.batches.append(list(items))
+        return [ValueError(item) if item < 0 else item * 10 for item in items]
+
+    def submit_concurrently(self, committer, items):
+        results = {}
+
+        def submit(item):
+            try:
+                results[item] = committer.submit(item)
+            except ValueError as exc:
+                results[item] = exc
+
+        threads = [threading.Thread(target=submit, args=(item,)) for item in items]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def setUp(self):
+        self.batches = []
+
+    def test_coalesces_up_to_max_rows(self):
+        committer = GroupCommitter('test', self.flush, max_rows=4, max_delay=10)
+        results = self.submit_concurrently(committer, [1, 2, 3, 4])
+        self.assertEqual(results, {1: 10, 2: 20, 3: 30, 4: 40})
+        self.assertEqual([sorted(batch) for batch in self.batches], [[1, 2, 3, 4]])
+
+    def test_flushes_after_max_delay(self):
+        committer = GroupCommitter('test', self.flush, max_rows=100, max_delay=0.001)
+        self.assertEqual(committer.submit(1), 10)
+        self.assertEqual(committer.submit(2), 20)
+        self.assertEqual(self.batches, [[1], [2]])
+
+    def test_errors_per_item(self):
+        committer = GroupCommitter('test', self.flush, max_rows=3, max_delay=10)
+        results = self.submit_concurrently(committer, [1, -2, 3])
+        self.assertEqual(results[1], 10)
+        self.assertEqual(results[3], 30)
+        self.assertIsInstance(results[-2], ValueError)
+
+    def test_flush_failure(self):
+        def flush(items):
+            raise RuntimeError("Lost connection")
+
+        committer = GroupCommitter('test', flush, max_rows=100, max_delay=0.001)
+        with self.assertRaises(RuntimeError):
+            committer.submit(1)
+
+
+class TestORJSON(TestCase):
+
+    def test_renders_like_json_renderer(self):
+        payloads = [
+            {'next': None, 'previous': 'http://testserver/api/vaccinations?cursor=eyJwIjpbMV19', 'results': []},
+            [{'rut': '115417479', 'dose': '0.15', 'date': '2020-09-01T12:00:00.123456Z',
+              'drug': {'name': 'Vacuna ñandú "B"', 'code': 'drug1', 'description': 'línea\nnueva\t\x1f/\\'}}],
+            {'dose': Decimal('0.15'), 'total': Decimal('10'), 'ints': [0, -1, 2 ** 63 - 1], 'flags': [True, False]},
+            {'aware': datetime(2020, 9, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+             'naive': datetime(2020, 9, 1, 12, 0), 'day': date(2020, 9, 1), 'time': time(10, 30),
+             'delta': timedelta(hours=1), 'uuid': uuid.UUID(int=1)},
+            {'santiago': timezone.localtime(datetime(2020, 9, 1, 12, 0, tzinfo=timezone.utc),
+                                            timezone.get_fixed_timezone(-180))},
+            ReturnDict([('detail', ErrorDetail('Invalid rut', code='invalid'))], serializer=None),
+            {'lazy': _('Invalid cursor'), 1: 'int key', 'separators': '\u2028\u2029'},
+            {'huge': 2 ** 70},
+            'string',
+        ]
+        for payload in payloads:
+            self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_uses_json_renderer(self):
+        payload = {'results': [{'rut': '115417479'}]}
+        self.assertEqual(ORJSONRenderer().render(payload, 'application/json; indent=4'),
+                         JSONRenderer().render(payload, 'application/json; indent=4'))
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {})
+
+    def test_parses_like_json_parser(self):
+        bodies = [
+            b'{"rut": "115417479", "dose": 0.5, "drug_id": 1}',
+            b'[{"rut": "11.541.747-9", "dose": "0.15"}, null, true, 1e3]',
+            '{"name": "ñandú \\u2028"}'.encode(),
+            b'{"huge": 123456789012345678901234567890}',
+        ]
+        for body in bodies:
+            self.assertEqual(self.parse(ORJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_parse_errors_like_json_parser(self):
+        for body in [b'{"rut": ', b'{"dose": NaN}', b'', '\ufeff{}'.encode()]:
+            with self.assertRaises(ParseError) as orjson_error:
+                self.parse(ORJSONParser(), body)
+            with self.assertRaises(ParseError) as json_error:
+                self.parse(JSONParser(), body)
+            self.assertEqual(str(orjson_error.exception), str(json_error.exception))
+
+
+class TestWarmup(TestCase):
+
+    def test_warmup(self):
+        Drug.objects.create(name='Drug1', code='drug1', description='drug1')
+
+        resp = self.client.get(reverse('warmup'))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        phases = [phase['name'] for phase in resp.json()['phases']]
+        for phase in ['warmup_urlconf', 'warmup_imports', 'warmup_database', 'warmup_caches']:
+            self.assertIn(phase, phases)
+
+        # The drug catalog is loaded, later requests are served from memory.
+        with self.assertNumQueries(0):
+            self.client.get(reverse('warmup'))
+
+    def test_warmup_get_only(self):
+        self.assertEqual(self.client.post(reverse('warmup')).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class TestStartupTimer(TestCase):
+
+    def test_phases(self):
+        timer = StartupTimer()
+        timer.mark('imports')
+        with timer.phase('warmup'):
+            pass
+        timer.finish_request()
+        self.assertEqual([phase['name'] for phase in timer.report()['phases']], ['imports', 'warmup'])
+
+        with self.assertLogs('portal.startup', 'INFO') as logs:
+            timer.start_request()
+            timer.finish_request()
+        timer.start_request()
+        timer.finish_request()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('first_request=', logs.output[0])
+        self.assertEqual([phase['name'] for phase in timer.report()['phases']], ['imports', 'warmup', 'first_request'])
+
+
+class TestBenchmarkCommands(TestCase):
+
+    def test_generate_data(self):
+        call_command('generate_data', drugs=3, vaccinations=250, days=10, batch_size=100, stdout=io.StringIO())
+        self.assertEqual(Drug.objects.count(), 3)
+        self.assertEqual(Vaccination.objects.count(), 250)
+        for vaccination in Vaccination.objects.all():
+            self.assertEqual(vaccination.rut_dv, compute_verification_digit(vaccination.rut_number))
+        self.assertEqual(sum(VaccinationDailyStat.objects.values_list('count', flat=True)), 250)
+
+        # Runs again without drug code clashes.
+        call_command('generate_data', drugs=3, vaccinations=0, stdout=io.StringIO())
+        self.assertEqual(Drug.objects.count(), 6)
+
+    def test_benchmark_api(self):
+        call_command('generate_data', drugs=2, vaccinations=20, stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_api', requests=2, warmup=1, output=baseline, stdout=io.StringIO())
+            with open(baseline) as output:
+                results = json.load(output)['results']
+            for name in ('vaccinations:delete', 'vaccinations:bulk', 'vaccinations:export', 'vaccinations:stats'):
+                self.assertIn(name, results)
+            for result in results.values():
+                self.assertEqual(result['requests'], 2)
+                self.assertEqual(result['errors'], 0)
+
+            stdout = io.StringIO()
+            call_command('benchmark_api', requests=2, warmup=1, compare=baseline, stdout=stdout)
+            self.assertIn('drugs:list', stdout.getvalue())
+
+        # The rows created by the benchmark are deleted again.
+        self.assertEqual(Drug.objects.count(), 2)
+        self.assertEqual(Vaccination.objects.count(), 20)
+        self.assertEqual(VaccinationDailyStat.objects.aggregate(total=Sum('count'))['total'], 20)
+
+
+@override_settings(ROOT_URLCONF='portal.urls_asgi')
+class TestAsyncReadViews(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="user_test")
+        token = RefreshToken.for_user(self.user).access_token
+        # Django 3.1's AsyncClient copies extra kwargs into the ASGI scope, so
+        # request headers have to be given as the scope's header list.
+        self.headers = [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())]
+        self.drug = Drug.objects.create(name='Drug1', code='drug1', description='drug1')
+        self.vaccination = Vaccination.objects.create(rut='115417479', dose='0.15', drug=self.drug)
+
+    async def test_reads(self):
+        urls = [
+            reverse('drugs:list_create'),
+            reverse('drugs:retrieve_update_delete', kwargs={'id': self.drug.id}),
+            reverse('vaccinations:list_create'),
+            reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        ]
+        responses = await asyncio.gather(*[self.async_client.get(url, headers=self.headers) for url in urls * 5])
+        self.assertEqual({resp.status_code for resp in responses}, {status.HTTP_200_OK})
+        self.assertEqual(json.loads(responses[2].content)['results'][0]['rut'], '11.541.747-9')
+
+        resp = await self.async_client.get(urls[0])
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_write(self):
+        body = json.dumps({'rut': '115417479', 'dose': '0.50', 'drug_id': self.drug.id}).encode()
+        headers = self.headers + [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        resp = await self.async_client.post(reverse('vaccinations:list_create'), body,
+                                            content_type='application/json', headers=headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+        resp = await self.async_client.get(reverse('vaccinations:list_create'), headers=self.headers)
+        self.assertEqual(len(json.loads(resp.content)['results']), 2)
+
+    async def test_write_skips_group_commit(self):
+        # Writes share one thread under ASGI, so no batch could ever have more
+        # than one row.
+        body = json.dumps({'rut': '115417479', 'dose': '0.50', 'drug_id': self.drug.id}).encode()
+        headers = self.headers + [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        batches = metrics.group_commit_rows.get_count(('vaccinations',))
+        with self.settings(VACCINATION_GROUP_COMMIT=True):
+            resp = await self.async_client.post(reverse('vaccinations:list_create'), body,
+                                                content_type='application/json', headers=headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(metrics.group_commit_rows.get_count(('vaccinations',)), batches)
@@ -0,0 +1,69 @@
+"""
+Per-request timing breakdown.
+
+`RequestTimingMiddleware` starts a `RequestTiming` for every request and makes
+it current for the code serving it. Blocks wrapped in `timed()` and database
+queries (through `record_query`, installed on every connection) add their
+duration to the current timing. Outside a request both are no-ops apart from
+one context variable lookup.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_timing = ContextVar('portal_request_timing', default=None)
+
+
+class RequestTiming:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.queries = 0
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+
+    def activate(self):
+        return _current_timing.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_timing.reset(token)
+
+
+def get_current_timing():
+    return _current_timing.get()
+
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to phase `name` of the current request.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries and their time in the current
+    request.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add('db', time.perf_counter() - started)
+        timing.queries += 1
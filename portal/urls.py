@@ -13,11 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.conf.urls import url, include
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
+from portal.views import metrics, sweep_idempotency_keys, warmup
+
 urlpatterns = [
+    path('_ah/warmup', warmup, name='warmup'),
+    path('metrics', metrics, name='metrics'),
+    path('cron/sweep_idempotency_keys', sweep_idempotency_keys, name='sweep_idempotency_keys'),
     # path('admin', admin.site.urls),
     path('api/token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
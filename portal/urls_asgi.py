@@ -0,0 +1,20 @@
+"""portal URL Configuration for the ASGI deployment (portal/asgi.py)
+
+Same routes as `portal.urls`, with the drug and vaccination list and detail
+endpoints served by async views.
+"""
+from django.urls import path, include
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
+
+from portal.views import metrics, sweep_idempotency_keys, warmup
+
+urlpatterns = [
+    path('_ah/warmup', warmup, name='warmup'),
+    path('metrics', metrics, name='metrics'),
+    path('cron/sweep_idempotency_keys', sweep_idempotency_keys, name='sweep_idempotency_keys'),
+    path('api/token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/verify', TokenVerifyView.as_view(), name='token_verify'),
+    path('api/drugs', include("drugs.urls_asgi", namespace="drugs")),
+    path('api/vaccinations', include("vaccinations.urls_asgi", namespace="vaccinations"))
+]
@@ -0,0 +1,66 @@
+"""
+Version stamps shared by every process through the Django cache.
+
+A stamp identifies the current contents of a table. Writers replace it with a
+fresh token, so processes holding derived data (in-memory caches, HTTP
+validators) notice the change by comparing stamps. Tokens embed their creation
+time and a random part and are never reused, so an evicted stamp only causes a
+spurious refresh and never a stale hit.
+"""
+import datetime
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+VERSION_KEY = 'portal:version:%s'
+
+
+def _new_version():
+    return '%x.%s' % (time.time_ns() // 1000, uuid.uuid4().hex[:12])
+
+
+def get_version(name):
+    version = cache.get(VERSION_KEY % name)
+    if version is None:
+        cache.add(VERSION_KEY % name, _new_version(), None)
+        version = cache.get(VERSION_KEY % name)
+    return version
+
+
+def get_versions(*names):
+    """
+    Like `get_version` for several stamps, read with one cache round-trip (one
+    query with the database cache) when they all exist.
+    """
+    keys = [VERSION_KEY % name for name in names]
+    versions = cache.get_many(keys)
+    return [versions[key] if key in versions else get_version(name) for key, name in zip(keys, names)]
+
+
+def bump_version(name):
+    version = _new_version()
+    cache.set(VERSION_KEY % name, version, None)
+    return version
+
+
+def bump_version_on_commit(name, using=None):
+    """
+    Bumps the stamp right away for this process and again once the current
+    transaction commits, in case another process refreshed in between.
+    """
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name), using=using)
+
+
+def get_version_time(version):
+    """
+    Returns when `version` was created as an aware datetime.
+    """
+    try:
+        microseconds = int(version.split('.', 1)[0], 16)
+    except (AttributeError, ValueError):
+        return timezone.now()
+    return datetime.datetime.fromtimestamp(microseconds / 1e6, tz=datetime.timezone.utc)
@@ -0,0 +1,82 @@
+import hmac
+import importlib
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import get_resolver
+from django.views.decorators.http import require_GET
+from rest_framework.settings import api_settings
+
+from drugs.cache import drug_cache
+from portal import metrics as portal_metrics
+from portal.models import IdempotencyKey
+from portal.startup import startup_timer
+from portal.versions import get_version
+
+# Modules the URLconf does not import by itself but the first requests need.
+WARMUP_MODULES = [
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.tokens',
+    'drugs.serializers',
+    'vaccinations.serializers',
+    'vaccinations.filters',
+    'vaccinations.renderers',
+]
+
+
+@require_GET
+def warmup(request):
+    """
+    App Engine warmup request (/_ah/warmup).
+
+    Sent to a new instance before it takes traffic: loads the URLconf (and with
+    it every view), the serializers and DRF's default classes, connects to the
+    database and loads the shared version stamps and the drug catalog, so that
+    none of it is paid by the first user request. Answers with the cold start
+    timing breakdown.
+    """
+    with startup_timer.phase('warmup_urlconf'):
+        get_resolver().url_patterns
+    with startup_timer.phase('warmup_imports'):
+        for module in WARMUP_MODULES:
+            importlib.import_module(module)
+        api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        api_settings.DEFAULT_RENDERER_CLASSES
+        api_settings.DEFAULT_PARSER_CLASSES
+        api_settings.DEFAULT_PAGINATION_CLASS
+    with startup_timer.phase('warmup_database'):
+        connection.ensure_connection()
+    with startup_timer.phase('warmup_caches'):
+        get_version('vaccinations')
+        drug_cache.all()
+    return JsonResponse(startup_timer.report())
+
+
+@require_GET
+def metrics(request):
+    """
+    Request metrics of this process in the Prometheus text format.
+
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`; without
+    a configured token the endpoint does not exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    expected = 'Bearer %s' % settings.METRICS_TOKEN
+    if not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+        return HttpResponse(status=401)
+    return HttpResponse(portal_metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_GET
+def sweep_idempotency_keys(request):
+    """
+    App Engine cron job (cron.yaml) deleting expired idempotency keys.
+
+    App Engine removes the `X-Appengine-Cron` header from outside requests, so
+    only its cron service gets past the check.
+    """
+    if request.headers.get('X-Appengine-Cron') != 'true':
+        raise Http404
+    return JsonResponse({'deleted': IdempotencyKey.objects.sweep()})
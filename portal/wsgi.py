@@ -3,14 +3,25 @@ WSGI config for portal project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+This is what ``django.core.wsgi.get_wsgi_application`` does, split into steps
+so ``portal.startup`` can time each of them.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/1.11/howto/deployment/wsgi/
 """
 
+from portal.startup import startup_timer  # noqa: I001 must be first, it starts the cold start clock
+
 import os
 
-from django.core.wsgi import get_wsgi_application
+import django
+from django.core.handlers.wsgi import WSGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portal.settings")
+startup_timer.mark('imports')
+
+django.setup(set_prefix=False)
+startup_timer.mark('django_setup')
 
-application = get_wsgi_application()
+application = WSGIHandler()
+startup_timer.mark('handler')
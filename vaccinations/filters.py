@@ -0,0 +1,113 @@
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from portal.batch import MAX_ID
+from vaccinations.rut import parse_rut
+
+
+def parse_drug_id(value):
+    """
+    The drug id of a `drug` filter, ValueError if it cannot be one.
+    """
+    drug_id = int(value)
+    if not 0 < drug_id <= MAX_ID:
+        raise ValueError(value)
+    return drug_id
+
+
+class VaccinationFilterBackend(BaseFilterBackend):
+    """
+    Filters vaccinations by patient `rut`, `drug` id and a `date_from`/`date_to`
+    range.
+
+    RUTs are parsed to their integer body first, so any formatting of the same
+    RUT hits the same `(rut_number, date)` index entries.
+
+    Range bounds are inclusive and accept ISO 8601 dates or datetimes; a bare
+    `date_to` date covers that whole day.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+        errors = {}
+
+        if 'rut' in params:
+            try:
+                filters['rut_number'], _rut_dv = parse_rut(params['rut'])
+            except ValueError:
+                errors['rut'] = [_("Invalid rut")]
+
+        if 'drug' in params:
+            try:
+                filters['drug_id'] = parse_drug_id(params['drug'])
+            except ValueError:
+                errors['drug'] = [_("Invalid drug id")]
+
+        for param in ('date_from', 'date_to'):
+            if param not in params:
+                continue
+            value = self.parse_bound(params[param])
+            if value is None:
+                errors[param] = [_("Invalid date. Use an ISO 8601 date or datetime")]
+            elif isinstance(value, datetime.datetime):
+                filters['date__gte' if param == 'date_from' else 'date__lte'] = value
+            elif param == 'date_from':
+                filters['date__gte'] = self.start_of_day(value)
+            else:
+                filters['date__lt'] = self.start_of_day(value + datetime.timedelta(days=1))
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**filters)
+
+    @staticmethod
+    def parse_bound(value):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                return parse_date(value)
+        except ValueError:
+            return None
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    @staticmethod
+    def start_of_day(date):
+        return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class VaccinationDailyStatFilterBackend(BaseFilterBackend):
+    """
+    Filters daily rollups by `drug` id and an inclusive `date_from`/`date_to`
+    range of ISO 8601 dates.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+        errors = {}
+
+        if 'drug' in params:
+            try:
+                filters['drug_id'] = parse_drug_id(params['drug'])
+            except ValueError:
+                errors['drug'] = [_("Invalid drug id")]
+
+        for param, lookup in (('date_from', 'day__gte'), ('date_to', 'day__lte')):
+            if param not in params:
+                continue
+            try:
+                filters[lookup] = parse_date(params[param])
+            except ValueError:
+                filters[lookup] = None
+            if filters[lookup] is None:
+                errors[param] = [_("Invalid date. Use an ISO 8601 date")]
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**filters)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from vaccinations.models import VaccinationDailyStat
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily vaccination rollups from the vaccinations table."
+
+    def handle(self, *args, **options):
+        VaccinationDailyStat.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {VaccinationDailyStat.objects.count()} daily vaccination rollups."
+        ))
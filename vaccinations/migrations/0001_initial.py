@@ -0,0 +1,26 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('drugs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vaccination',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rut', models.CharField(max_length=100, verbose_name='Rut')),
+                ('dose', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Dose')),
+                ('date', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('drug', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='drugs.drug')),
+            ],
+        ),
+    ]
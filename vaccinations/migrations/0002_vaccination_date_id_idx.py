@@ -0,0 +1,17 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaccinations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['date', 'id'], name='vaccination_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:26
+
+import re
+
+from django.db import migrations, models
+from django.db.models import Q
+
+# The RUT parsing of vaccinations.rut when this migration was written, copied
+# so that later changes there do not change what it does.
+RUT_PATTERN = re.compile(r'^(?:(\d{1,3}(?:\.\d{3})+)-|(\d+)-?)([\dkK])$')
+
+
+def compute_verification_digit(number):
+    total = 0
+    factor = 2
+    while number:
+        total += (number % 10) * factor
+        number //= 10
+        factor = 2 if factor == 7 else factor + 1
+    digit = (11 - total % 11) % 11
+    return 'K' if digit == 10 else str(digit)
+
+
+def normalize_rut(rut):
+    match = RUT_PATTERN.match(rut.strip())
+    if match is None:
+        return None
+    number = int((match.group(1) or match.group(2)).replace('.', ''))
+    verification_digit = match.group(3).upper()
+    if not 0 < number <= 2147483647 or compute_verification_digit(number) != verification_digit:
+        return None
+    return f'{number}{verification_digit}'
+
+
+def normalize_ruts(apps, schema_editor):
+    Vaccination = apps.get_model('vaccinations', 'Vaccination')
+    db_alias = schema_editor.connection.alias
+    formatted = Vaccination.objects.using(db_alias).filter(
+        Q(rut__contains='.') | Q(rut__contains='-') | Q(rut__contains='k') | Q(rut__startswith='0')
+    ).only('id', 'rut').order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(formatted.filter(id__gt=last_id)[:1000])
+        for vaccination in batch:
+            vaccination.rut = normalize_rut(vaccination.rut) or vaccination.rut
+        Vaccination.objects.using(db_alias).bulk_update(batch, ['rut'])
+        if len(batch) < 1000:
+            break
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaccinations', '0002_vaccination_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_ruts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['rut', 'date'], name='vaccination_rut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['drug', 'date'], name='vaccination_drug_date_idx'),
+        ),
+    ]
@@ -0,0 +1,155 @@
+import re
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+
+# The RUT parsing of vaccinations.rut when this migration was written, copied
+# so that later changes there do not change what it does.
+RUT_PATTERN = re.compile(r'^(?:(\d{1,3}(?:\.\d{3})+)-|(\d+)-?)([\dkK])$')
+MAX_RUT_NUMBER = 2147483647
+
+
+def compute_verification_digit(number):
+    total = 0
+    factor = 2
+    while number:
+        total += (number % 10) * factor
+        number //= 10
+        factor = 2 if factor == 7 else factor + 1
+    digit = (11 - total % 11) % 11
+    return 'K' if digit == 10 else str(digit)
+
+
+def parse_rut(rut):
+    match = RUT_PATTERN.match(rut.strip())
+    if match is None:
+        raise ValueError("Invalid rut format")
+    number = int((match.group(1) or match.group(2)).replace('.', ''))
+    verification_digit = match.group(3).upper()
+    if not 0 < number <= MAX_RUT_NUMBER or compute_verification_digit(number) != verification_digit:
+        raise ValueError("Invalid rut verification digit")
+    return number, verification_digit
+
+
+def check_ruts(apps, schema_editor):
+    """
+    Fails before any change when some rut cannot be split, listing the rows to
+    fix. The legacy validator accepted RUTs such as `0-0` that have no valid
+    body: correct or delete those rows, for example from `manage.py shell`
+    with `Vaccination.objects.filter(id__in=[...]).delete()` on the previous
+    release, then run the migration again.
+    """
+    Vaccination = apps.get_model('vaccinations', 'Vaccination')
+    db_alias = schema_editor.connection.alias
+    rows = Vaccination.objects.using(db_alias).only('id', 'rut').order_by('id')
+
+    invalid = []
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id)[:BATCH_SIZE])
+        for vaccination in batch:
+            try:
+                parse_rut(vaccination.rut)
+            except ValueError:
+                invalid.append(vaccination)
+        if len(batch) < BATCH_SIZE:
+            break
+        last_id = batch[-1].id
+    if invalid:
+        listed = ', '.join(f'{vaccination.id} ({vaccination.rut!r})' for vaccination in invalid[:20])
+        more = f' and {len(invalid) - 20} more' if len(invalid) > 20 else ''
+        raise ValueError(f"{len(invalid)} vaccinations have a rut that cannot be split: {listed}{more}. "
+                         f"Correct or delete them and run the migration again.")
+
+
+def split_ruts(apps, schema_editor):
+    """
+    Fills rut_number/rut_dv from the legacy rut column, one short transaction per
+    batch so writers are never blocked for long. Only rows that were not split yet
+    are selected, so the migration can be resumed after an interruption.
+    """
+    Vaccination = apps.get_model('vaccinations', 'Vaccination')
+    db_alias = schema_editor.connection.alias
+    pending = Vaccination.objects.using(db_alias).filter(rut_number__isnull=True).only('id', 'rut').order_by('id')
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(pending.filter(id__gt=last_id)[:BATCH_SIZE])
+            for vaccination in batch:
+                try:
+                    vaccination.rut_number, vaccination.rut_dv = parse_rut(vaccination.rut)
+                except ValueError:
+                    raise ValueError(f"Vaccination {vaccination.id} has an invalid rut: {vaccination.rut!r}")
+            Vaccination.objects.using(db_alias).bulk_update(batch, ['rut_number', 'rut_dv'])
+        if len(batch) < BATCH_SIZE:
+            break
+        last_id = batch[-1].id
+
+
+def join_ruts(apps, schema_editor):
+    Vaccination = apps.get_model('vaccinations', 'Vaccination')
+    db_alias = schema_editor.connection.alias
+    pending = Vaccination.objects.using(db_alias).only('id', 'rut_number', 'rut_dv').order_by('id')
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(pending.filter(id__gt=last_id)[:BATCH_SIZE])
+            for vaccination in batch:
+                vaccination.rut = f'{vaccination.rut_number}{vaccination.rut_dv}'
+            Vaccination.objects.using(db_alias).bulk_update(batch, ['rut'])
+        if len(batch) < BATCH_SIZE:
+            break
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('vaccinations', '0003_vaccination_rut_drug_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_ruts, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='vaccination',
+            name='rut_number',
+            field=models.PositiveIntegerField(null=True, verbose_name='Rut number'),
+        ),
+        migrations.AddField(
+            model_name='vaccination',
+            name='rut_dv',
+            field=models.CharField(default='', max_length=1, verbose_name='Rut verification digit'),
+        ),
+        migrations.AlterField(
+            model_name='vaccination',
+            name='rut',
+            field=models.CharField(default='', max_length=100, verbose_name='Rut'),
+        ),
+        migrations.RunPython(split_ruts, join_ruts),
+        migrations.RemoveIndex(
+            model_name='vaccination',
+            name='vaccination_rut_date_idx',
+        ),
+        migrations.RemoveField(
+            model_name='vaccination',
+            name='rut',
+        ),
+        migrations.AlterField(
+            model_name='vaccination',
+            name='rut_number',
+            field=models.PositiveIntegerField(verbose_name='Rut number'),
+        ),
+        migrations.AlterField(
+            model_name='vaccination',
+            name='rut_dv',
+            field=models.CharField(max_length=1, verbose_name='Rut verification digit'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['rut_number', 'date'], name='vaccination_rut_date_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:31
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def build_daily_stats(apps, schema_editor):
+    Vaccination = apps.get_model('vaccinations', 'Vaccination')
+    VaccinationDailyStat = apps.get_model('vaccinations', 'VaccinationDailyStat')
+    db_alias = schema_editor.connection.alias
+    totals = Vaccination.objects.using(db_alias).annotate(day=TruncDate('date')).order_by().values(
+        'day', 'drug_id').annotate(count=Count('id'), total_dose=Sum('dose'))
+    VaccinationDailyStat.objects.using(db_alias).bulk_create(
+        [VaccinationDailyStat(**total) for total in totals], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drugs', '0001_initial'),
+        ('vaccinations', '0004_vaccination_rut_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VaccinationDailyStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('total_dose', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total dose')),
+                ('drug', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='drugs.drug')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vaccinationdailystat',
+            constraint=models.UniqueConstraint(fields=('day', 'drug'), name='vaccination_daily_stat_day_drug'),
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaccinations', '0005_vaccinationdailystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaccination',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Modified'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vaccinations', '0006_vaccination_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vaccination',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, verbose_name='Change sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccination',
+            index=models.Index(fields=['change_seq', 'id'], name='vaccination_change_seq_idx'),
+        ),
+    ]
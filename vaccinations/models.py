@@ -1,12 +1,190 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DatabaseError, models, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 
 from django.utils.translation import ugettext_lazy as _
 
 from drugs.models import Drug
+from portal.changes import next_change_seq, record_deletions
+from portal.versions import bump_version_on_commit
+from vaccinations.rut import format_rut, parse_rut
+
+
+class VaccinationManager(models.Manager):
+
+    def bulk_ingest(self, vaccinations, batch_size=None):
+        """
+        Inserts `vaccinations` with batched INSERTs and records them like `save()`
+        would, all in one transaction.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            change_seq = next_change_seq(self.model, self.db)
+            for vaccination in vaccinations:
+                vaccination.change_seq = change_seq
+            vaccinations = self.bulk_create(vaccinations, batch_size=batch_size)
+            VaccinationDailyStat.objects.db_manager(self.db).record(
+                added=[vaccination.stat_key for vaccination in vaccinations]
+            )
+            bump_version_on_commit(self.model.version_name, using=self.db)
+        return vaccinations
+
+    def ingest_each(self, vaccinations):
+        """
+        `bulk_ingest` returning one result per vaccination: the inserted instance,
+        or the exception that kept it from being inserted. When the batch fails,
+        its rows are retried one by one so that only the failing ones get an error.
+        """
+        try:
+            with transaction.atomic(using=self.db):
+                return self.bulk_ingest(vaccinations)
+        except DatabaseError as exc:
+            if len(vaccinations) == 1:
+                return [exc]
+        results = []
+        for vaccination in vaccinations:
+            try:
+                with transaction.atomic(using=self.db):
+                    results.extend(self.bulk_ingest([vaccination]))
+            except DatabaseError as exc:
+                results.append(exc)
+        return results
 
 
 class Vaccination(models.Model):
-    rut = models.CharField(verbose_name=_("Rut"), max_length=100)
+    """
+    A dose administered to a patient.
+
+    Saving or deleting an instance updates `VaccinationDailyStat`, bumps the
+    `vaccinations` version stamp and records the change for the change feed in
+    the same transaction. Bulk inserts must go
+    through `Vaccination.objects.bulk_ingest`; other queryset writes (`update`,
+    `delete`) bypass both.
+    """
+    version_name = 'vaccinations'
+
+    rut_number = models.PositiveIntegerField(verbose_name=_("Rut number"))
+    rut_dv = models.CharField(verbose_name=_("Rut verification digit"), max_length=1)
     dose = models.DecimalField(verbose_name=_("Dose"), decimal_places=2, max_digits=5)
     date = models.DateTimeField(verbose_name=_("Date"), auto_now_add=True)
     drug = models.ForeignKey(Drug, on_delete=models.PROTECT)
+    modified = models.DateTimeField(verbose_name=_("Modified"), auto_now=True)
+    change_seq = models.BigIntegerField(verbose_name=_("Change sequence"), default=0)
+
+    objects = VaccinationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='vaccination_date_id_idx'),
+            models.Index(fields=['rut_number', 'date'], name='vaccination_rut_date_idx'),
+            models.Index(fields=['drug', 'date'], name='vaccination_drug_date_idx'),
+            models.Index(fields=['change_seq', 'id'], name='vaccination_change_seq_idx'),
+        ]
+
+    @property
+    def rut(self):
+        return format_rut(self.rut_number, self.rut_dv)
+
+    @rut.setter
+    def rut(self, value):
+        self.rut_number, self.rut_dv = parse_rut(value)
+
+    @property
+    def stat_key(self):
+        return timezone.localdate(self.date), self.drug_id, self.dose
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_stat_key = instance.stat_key if {'date', 'drug_id', 'dose'} <= set(field_names) else None
+        return instance
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        saved_stat_key = getattr(self, '_saved_stat_key', None)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+        with transaction.atomic(using=using, savepoint=False):
+            self.change_seq = next_change_seq(type(self), using)
+            super().save(*args, **kwargs)
+            VaccinationDailyStat.objects.db_manager(using).record(
+                added=[self.stat_key], removed=[saved_stat_key] if saved_stat_key else []
+            )
+            bump_version_on_commit(self.version_name, using=using)
+        self._saved_stat_key = self.stat_key
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            object_id = self.id
+            change_seq = next_change_seq(type(self), using)
+            result = super().delete(using=using, keep_parents=keep_parents)
+            record_deletions(type(self), [object_id], change_seq, using=using)
+            VaccinationDailyStat.objects.db_manager(using).record(
+                removed=[getattr(self, '_saved_stat_key', None) or self.stat_key]
+            )
+            bump_version_on_commit(self.version_name, using=using)
+        self._saved_stat_key = None
+        return result
+
+
+class VaccinationDailyStatManager(models.Manager):
+
+    def record(self, added=(), removed=()):
+        """
+        Applies vaccinations added and removed, given as `(day, drug_id, dose)`
+        keys, to the daily rollups. Must run in the transaction of the change.
+        """
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for keys, sign in ((added, 1), (removed, -1)):
+            for day, drug_id, dose in keys:
+                delta = deltas[day, drug_id]
+                delta[0] += sign
+                delta[1] += sign * Decimal(dose)
+
+        missing = []
+        for (day, drug_id), (count, dose) in deltas.items():
+            if count or dose:
+                if not self._apply(day, drug_id, count, dose):
+                    missing.append((day, drug_id, count, dose))
+
+        if missing:
+            self.bulk_create([self.model(day=day, drug_id=drug_id) for day, drug_id, _, _ in missing],
+                             ignore_conflicts=True)
+            for day, drug_id, count, dose in missing:
+                self._apply(day, drug_id, count, dose)
+
+    def rebuild(self):
+        """
+        Recomputes every rollup from the vaccinations table.
+        """
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            totals = Vaccination.objects.using(self.db).annotate(day=TruncDate('date')).order_by().values(
+                'day', 'drug_id').annotate(count=Count('id'), total_dose=Sum('dose'))
+            self.bulk_create([self.model(**total) for total in totals], batch_size=1000)
+
+    def _apply(self, day, drug_id, count, dose):
+        return self.filter(day=day, drug_id=drug_id).update(
+            count=F('count') + count, total_dose=F('total_dose') + dose,
+        )
+
+
+class VaccinationDailyStat(models.Model):
+    """
+    Number of vaccinations and total dose administered per drug and day.
+    """
+    day = models.DateField(verbose_name=_("Day"))
+    drug = models.ForeignKey(Drug, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(verbose_name=_("Count"), default=0)
+    total_dose = models.DecimalField(verbose_name=_("Total dose"), decimal_places=2, max_digits=14, default=0)
+
+    objects = VaccinationDailyStatManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'drug'], name='vaccination_daily_stat_day_drug'),
+        ]
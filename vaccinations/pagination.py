@@ -0,0 +1,5 @@
+from portal.pagination import KeysetCursorPagination
+
+
+class VaccinationCursorPagination(KeysetCursorPagination):
+    ordering = ('date', 'id')
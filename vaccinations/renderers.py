@@ -0,0 +1,52 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils import json
+
+
+class Echo:
+    """
+    File-like object whose `write` hands back the line instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.dumps(data).encode(self.charset)
+
+    def stream(self, columns, rows):
+        for row in rows:
+            yield self.dumps(dict(zip(columns, row)))
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        writer = csv.writer(Echo())
+        lines = [writer.writerow(['field', 'detail'])]
+        lines.extend(writer.writerow([key, value]) for key, value in data.items())
+        return ''.join(lines).encode(self.charset)
+
+    def stream(self, columns, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
@@ -0,0 +1,164 @@
+"""
+Serializer-free representation of vaccinations for the list and export endpoints.
+
+Rows are fetched as flat tuples of the needed columns, joined with their drug,
+and turned into exactly the values `VaccinationSerializer` produces without
+instantiating serializers or fields per row. `dose` and `date` go through the
+same DRF fields as the serializer unless the fast paths below give the very
+same string.
+"""
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from drugs.cache import drug_cache
+from drugs.serializers import DrugSerializer
+from portal.fieldsets import selected_columns, trim_serializer
+from vaccinations.models import Vaccination
+from vaccinations.rut import format_rut
+from vaccinations.serializers import VaccinationSerializer
+
+ROW_FIELDS = ('id', 'rut_number', 'rut_dv', 'dose', 'date', 'drug_id', 'drug__name', 'drug__code',
+              'drug__description')
+# Without the drug join, for the side-loaded (`?include=drugs`) shape.
+SIDE_LOADED_ROW_FIELDS = ('id', 'rut_number', 'rut_dv', 'dose', 'date', 'drug_id')
+DRUG_FIELDS = DrugSerializer.Meta.fields
+
+_dose_model_field = Vaccination._meta.get_field('dose')
+dose_field = serializers.DecimalField(max_digits=_dose_model_field.max_digits,
+                                      decimal_places=_dose_model_field.decimal_places)
+date_field = serializers.DateTimeField()
+
+# The representation of a dose only depends on its numeric value and doses
+# repeat a lot, so representations are memoized.
+_dose_representations = {}
+MAX_DOSE_REPRESENTATIONS = 10000
+
+
+def represent_dose(dose):
+    representation = _dose_representations.get(dose)
+    if representation is None:
+        representation = dose_field.to_representation(dose)
+        if len(_dose_representations) < MAX_DOSE_REPRESENTATIONS and api_settings.COERCE_DECIMAL_TO_STRING:
+            _dose_representations[dose] = representation
+    return representation
+
+
+def date_representer():
+    """
+    Returns a function representing datetimes like `DateTimeField`, for the
+    current timezone and settings.
+    """
+    if api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return date_field.to_representation
+    field_timezone = date_field.default_timezone()
+    if field_timezone is None:
+        return date_field.to_representation
+
+    def represent_date(date):
+        if date.tzinfo is None:
+            return date_field.to_representation(date)
+        value = date.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+
+    return represent_date
+
+
+def vaccination_rows(queryset, fields=ROW_FIELDS):
+    """
+    `queryset` as named tuples of `fields`.
+    """
+    return queryset.values_list(*fields, named=True)
+
+
+def represent_vaccinations(rows):
+    """
+    The `VaccinationSerializer(many=True).data` of `rows` from `vaccination_rows`.
+    """
+    represent_date = date_representer()
+    drugs = {}
+    results = []
+    for row in rows:
+        drug = drugs.get(row.drug_id)
+        if drug is None:
+            drug = drugs[row.drug_id] = {'name': row.drug__name, 'code': row.drug__code,
+                                         'description': row.drug__description}
+        results.append({
+            'rut': format_rut(row.rut_number, row.rut_dv),
+            'dose': represent_dose(row.dose),
+            'date': represent_date(row.date),
+            'drug': drug,
+        })
+    return results
+
+
+def represent_side_loaded_vaccinations(rows):
+    """
+    Like `represent_vaccinations`, for rows of `SIDE_LOADED_ROW_FIELDS`, with
+    `drug_id` in place of the nested drug.
+    """
+    represent_date = date_representer()
+    return [{
+        'rut': format_rut(row.rut_number, row.rut_dv),
+        'dose': represent_dose(row.dose),
+        'date': represent_date(row.date),
+        'drug_id': row.drug_id,
+    } for row in rows]
+
+
+def represent_drug_map(drug_ids, selection=None):
+    """
+    The side-loaded `drugs` of `drug_ids`: `DrugSerializer` output, limited to
+    the `selection` of sparse fieldsets if given, keyed by id and read from the
+    drug cache.
+    """
+    drugs = drug_cache.get_many(drug_ids)
+    serializer = DrugSerializer()
+    if selection:
+        trim_serializer(serializer, selection)
+    return {str(drug_id): serializer.to_representation(drugs[drug_id]) for drug_id in sorted(drugs)}
+
+
+def sparse_row_fields(selection, side_loaded=False):
+    """
+    The row fields `represent_sparse_vaccinations` needs for `selection`: the
+    pagination keys, `drug_id` and the columns of the selected fields.
+    """
+    fields = ['id', 'date', 'drug_id']
+    for column in selected_columns(VaccinationSerializer(), selection):
+        if column == 'drug' or side_loaded and column.startswith('drug__'):
+            continue
+        if column not in fields:
+            fields.append(column)
+    return fields
+
+
+def represent_sparse_vaccinations(rows, selection, side_loaded=False):
+    """
+    `represent_vaccinations` (or `represent_side_loaded_vaccinations`) limited
+    to the `selection` of sparse fieldsets, for rows of `sparse_row_fields`.
+    Fields keep the serializer order.
+    """
+    represent_date = date_representer()
+    getters = []
+    if 'rut' in selection:
+        getters.append(('rut', lambda row: format_rut(row.rut_number, row.rut_dv)))
+    if 'dose' in selection:
+        getters.append(('dose', lambda row: represent_dose(row.dose)))
+    if 'date' in selection:
+        getters.append(('date', lambda row: represent_date(row.date)))
+    if side_loaded:
+        getters.append(('drug_id', lambda row: row.drug_id))
+    elif 'drug' in selection:
+        drug_fields = [name for name in DRUG_FIELDS if not selection['drug'] or name in selection['drug']]
+        drugs = {}
+
+        def represent_drug(row):
+            drug = drugs.get(row.drug_id)
+            if drug is None:
+                drug = drugs[row.drug_id] = {name: getattr(row, 'drug__' + name) for name in drug_fields}
+            return drug
+
+        getters.append(('drug', represent_drug))
+    return [{name: getter(row) for name, getter in getters} for row in rows]
@@ -0,0 +1,56 @@
+import re
+
+RUT_PATTERN = re.compile(r'^(?:(\d{1,3}(?:\.\d{3})+)-|(\d+)-?)([\dkK])$')
+MAX_RUT_NUMBER = 2147483647
+
+
+def compute_verification_digit(number):
+    """
+    Returns the modulo 11 check digit of a RUT body: `0`-`9` or `K`.
+    """
+    total = 0
+    factor = 2
+    while number:
+        total += (number % 10) * factor
+        number //= 10
+        factor = 2 if factor == 7 else factor + 1
+    digit = (11 - total % 11) % 11
+    return 'K' if digit == 10 else str(digit)
+
+
+def parse_rut(rut):
+    """
+    Splits a RUT in any accepted format (`11.541.747-9`, `11541747-9`,
+    `115417479`) into its integer body and upper-case check digit.
+
+    Raises ValueError when the RUT is malformed or its check digit is wrong.
+    """
+    match = RUT_PATTERN.match(rut.strip()) if isinstance(rut, str) else None
+    if match is None:
+        raise ValueError("Invalid rut format")
+
+    number = int((match.group(1) or match.group(2)).replace('.', ''))
+    verification_digit = match.group(3).upper()
+    if not 0 < number <= MAX_RUT_NUMBER or compute_verification_digit(number) != verification_digit:
+        raise ValueError("Invalid rut verification digit")
+    return number, verification_digit
+
+
+def format_rut(number, verification_digit):
+    """
+    Returns the display form of a RUT, as the API returns it: `11.541.747-9`.
+    """
+    return f'{number:,}'.replace(',', '.') + '-' + verification_digit
+
+
+def normalize_rut(rut):
+    """
+    Returns the compact form of a valid RUT, or None when `rut` is not valid.
+
+    `11.541.747-9`, `11541747-9` and `115417479` all normalize to `115417479`.
+    """
+    try:
+        number, verification_digit = parse_rut(rut)
+    except ValueError:
+        return None
+    return f'{number}{verification_digit}'
@@ -2,17 +2,70 @@ from decimal import Decimal
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rut_chile import rut_chile
 
 from django.utils.translation import ugettext_lazy as _
 
+from drugs.cache import drug_cache
+from drugs.models import Drug
 from drugs.serializers import DrugSerializer
-from vaccinations.models import Vaccination
+from portal.serializers import TimedListSerializer, TimedSerializerMixin
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.rut import format_rut, parse_rut
 
 
-class VaccinationSerializer(serializers.ModelSerializer):
+class DrugIdField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves a drug id from the `drugs` map of the serializer context when one was
+    preloaded, or from the process drug cache otherwise.
+    """
+
+    def to_internal_value(self, data):
+        drugs = self.context.get('drugs')
+        if drugs is None:
+            drugs = drug_cache
+        try:
+            drug_id = int(data)
+        except (TypeError, ValueError, OverflowError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        # Like the pk lookup, only integers or their strings: no `true` or `1.9`.
+        if isinstance(data, bool) or (not isinstance(data, str) and drug_id != data):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        drug = drugs.get(drug_id)
+        if drug is None:
+            self.fail('does_not_exist', pk_value=data)
+        return drug
+
+
+class RutField(serializers.Field):
+    """
+    Accepts a RUT in any valid format, stores it as `rut_number`/`rut_dv` and
+    represents it in canonical form.
+    """
+    default_error_messages = {
+        'invalid': _("Invalid rut"),
+    }
+    # Model columns read, for sparse fieldsets.
+    columns = ['rut_number', 'rut_dv']
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            rut_number, rut_dv = parse_rut(data)
+        except ValueError:
+            self.fail('invalid')
+        return {'rut_number': rut_number, 'rut_dv': rut_dv}
+
+    def to_representation(self, instance):
+        return format_rut(instance.rut_number, instance.rut_dv)
+
+
+class VaccinationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    rut = RutField()
     drug = DrugSerializer(read_only=True)
-    drug_id = serializers.IntegerField(write_only=True)
+    drug_id = DrugIdField(source='drug', queryset=Drug.objects.all(), write_only=True)
 
     def validate_dose(self, dose):
         minimum = Decimal('0.15')
@@ -21,11 +74,14 @@ class VaccinationSerializer(serializers.ModelSerializer):
             raise ValidationError(_("Invalid dose. Value must be between 0.15 and 1.0"))
         return dose
 
-    def validate_rut(self, rut):
-        if not rut_chile.is_valid_rut(rut):
-            raise ValidationError(_("Invalid rut"))
-        return rut
-
     class Meta:
         model = Vaccination
         fields = ['rut', 'dose', 'date', 'drug', 'drug_id']
+        list_serializer_class = TimedListSerializer
+
+
+class VaccinationDailyStatSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = VaccinationDailyStat
+        fields = ['day', 'drug_id', 'count', 'total_dose']
+        list_serializer_class = TimedListSerializer
@@ -1,15 +1,32 @@
+import io
 import json
 import random
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from drugs.cache import drug_cache
 from drugs.models import Drug
-from vaccinations.models import Vaccination
+from portal import metrics
+from portal.changes import committed_change_seq, next_change_seq
+from portal.models import IdempotencyKey
+from portal.versions import bump_version
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.representations import represent_vaccinations, vaccination_rows
+from vaccinations.rut import format_rut, normalize_rut, parse_rut
+from vaccinations.serializers import VaccinationSerializer
 
 
 class VaccinationSetUp(TestCase):
@@ -46,12 +63,41 @@ class VaccinationSetUp(TestCase):
 class TestVaccinationListCreateView(VaccinationSetUp):
 
     def test_get(self):
-        resp = self.client.get(reverse('vaccination:list_create'), content_type=self.content_type, **self.headers)
+        resp = self.client.get(reverse('vaccinations:list_create'), content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        vaccination_list = resp.data
+        vaccination_list = resp.data['results']
 
         vaccination_count = Vaccination.objects.count()
         self.assertEqual(len(vaccination_list), vaccination_count)
+        self.assertIsNone(resp.data['next'])
+        self.assertIsNone(resp.data['previous'])
+
+    def test_get_paginated(self):
+        Vaccination.objects.bulk_create(
+            [Vaccination(rut=self.valid_rut, dose='0.20', drug=self.drug) for _ in range(24)]
+        )
+
+        url = reverse('vaccinations:list_create') + '?page_size=10'
+        pages = []
+        while url:
+            resp = self.client.get(url, content_type=self.content_type, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            pages.append(resp.data)
+            url = resp.data['next']
+
+        self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+        self.assertIsNone(pages[0]['previous'])
+
+        resp = self.client.get(pages[2]['previous'], content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['results'], pages[1]['results'])
+
+        dates = [vaccination['date'] for page in pages for vaccination in page['results']]
+        self.assertEqual(dates, sorted(dates))
+
+        resp = self.client.get(reverse('vaccinations:list_create') + '?cursor=invalid',
+                               content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_post(self):
         vaccination_count = Vaccination.objects.count()
@@ -62,7 +108,7 @@ class TestVaccinationListCreateView(VaccinationSetUp):
             'drug_id': self.drug.id
         }
 
-        resp = self.client.post(reverse('vaccination:list_create'), new_vaccination_data,
+        resp = self.client.post(reverse('vaccinations:list_create'), new_vaccination_data,
                                 content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
 
@@ -74,25 +120,35 @@ class TestVaccinationListCreateView(VaccinationSetUp):
             'dose': Decimal(random.randrange(15, 100)) / 100,
             'drug_id': self.drug.id
         }
-        resp = self.client.post(reverse('vaccination:list_create'), new_vaccination_data,
+        resp = self.client.post(reverse('vaccinations:list_create'), new_vaccination_data,
                                 content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
 
         self.assertTrue('rut' in resp.data)
         self.assertEqual(vaccination_count, Vaccination.objects.count())
 
+    def test_post_non_integer_drug_id(self):
+        vaccination_count = Vaccination.objects.count()
+        for drug_id in [True, 1.9, self.drug.id + 0.5]:
+            resp = self.client.post(reverse('vaccinations:list_create'),
+                                    {'rut': self.valid_rut, 'dose': '0.50', 'drug_id': drug_id},
+                                    content_type=self.content_type, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertTrue('drug_id' in resp.data)
+        self.assertEqual(vaccination_count, Vaccination.objects.count())
+
 
 class TestVaccinationRetrieveUpdateDestroyView(VaccinationSetUp):
 
     def test_get(self):
-        resp = self.client.get(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.get(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         vaccination_data = resp.data
 
         self.assertEqual(vaccination_data['rut'], self.vaccination.rut)
 
-        resp = self.client.get(reverse('vaccination:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.get(reverse('vaccinations:retrieve_update_delete', kwargs={'id': 1000}),
                                content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
@@ -101,7 +157,7 @@ class TestVaccinationRetrieveUpdateDestroyView(VaccinationSetUp):
         new_vaccination_data = {
             'dose': new_dose,
         }
-        resp = self.client.patch(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.patch(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                  new_vaccination_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
 
@@ -112,12 +168,12 @@ class TestVaccinationRetrieveUpdateDestroyView(VaccinationSetUp):
         new_vaccination_data = {
             'dose': new_dose,
         }
-        resp = self.client.patch(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.patch(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                  new_vaccination_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue('dose' in resp.data)
 
-        resp = self.client.patch(reverse('vaccination:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.patch(reverse('vaccinations:retrieve_update_delete', kwargs={'id': 1000}),
                                  new_vaccination_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
@@ -128,7 +184,7 @@ class TestVaccinationRetrieveUpdateDestroyView(VaccinationSetUp):
             'dose': new_dose,
             'drug_id': self.vaccination.drug.id
         }
-        resp = self.client.put(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.put(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                vaccination_update_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
 
@@ -141,27 +197,895 @@ class TestVaccinationRetrieveUpdateDestroyView(VaccinationSetUp):
             'dose': new_dose,
             'drug_id': self.vaccination.drug.id
         }
-        resp = self.client.put(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.put(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                vaccination_update_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue('dose' in resp.data)
 
-        resp = self.client.put(reverse('vaccination:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.put(reverse('vaccinations:retrieve_update_delete', kwargs={'id': 1000}),
                                vaccination_update_data, content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_delete(self):
         vaccination_count = Vaccination.objects.count()
 
-        resp = self.client.delete(reverse('vaccination:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+        resp = self.client.delete(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
                                   content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
         vaccination_count -= 1
 
         self.assertEqual(vaccination_count, Vaccination.objects.count())
 
-        resp = self.client.delete(reverse('vaccination:retrieve_update_delete', kwargs={'id': 1000}),
+        resp = self.client.delete(reverse('vaccinations:retrieve_update_delete', kwargs={'id': 1000}),
                                   content_type=self.content_type, **self.headers)
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
 
         self.assertEqual(vaccination_count, Vaccination.objects.count())
+
+
+class TestVaccinationFastRepresentation(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        drug = Drug.objects.create(name='Vacuna ñandú "B"', code='drug2', description='línea\nnueva')
+        for dose in ['0.2', '1', '0.99', '0.50']:
+            Vaccination.objects.create(rut='12.345.678-5', dose=dose, drug=drug)
+        Vaccination.objects.filter(dose=Decimal('0.99')).update(date=datetime(2020, 9, 1, 12, 0, tzinfo=timezone.utc))
+        Vaccination.objects.filter(dose=Decimal('1')).update(
+            date=datetime(2020, 3, 1, 23, 59, 59, 999999, tzinfo=timezone.utc))
+        self.queryset = Vaccination.objects.select_related('drug').order_by('date', 'id')
+
+    def render_both(self):
+        serialized = JSONRenderer().render(VaccinationSerializer(self.queryset, many=True).data)
+        represented = JSONRenderer().render(represent_vaccinations(vaccination_rows(self.queryset)))
+        return serialized, represented
+
+    def test_byte_identical(self):
+        serialized, represented = self.render_both()
+        self.assertEqual(serialized, represented)
+
+    def test_byte_identical_in_other_timezone(self):
+        with timezone.override('America/Santiago'):
+            serialized, represented = self.render_both()
+        self.assertIn(b'-03:00', serialized)
+        self.assertEqual(serialized, represented)
+
+    def test_list_response_byte_identical(self):
+        resp = self.client.get(reverse('vaccinations:list_create'), **self.headers)
+        expected = JSONRenderer().render({
+            'next': None,
+            'previous': None,
+            'results': VaccinationSerializer(self.queryset, many=True).data,
+        })
+        self.assertEqual(resp.content, expected)
+
+
+class TestVaccinationIncludeDrugs(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.other_drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        Drug.objects.create(name='Unused', code='drug3', description='drug3')
+        Vaccination.objects.bulk_create(
+            [Vaccination(rut=self.valid_rut, dose='0.20', drug=drug) for drug in [self.drug, self.other_drug] * 5]
+        )
+        self.url = reverse('vaccinations:list_create')
+
+    def test_side_loaded(self):
+        resp = self.client.get(self.url + '?include=drugs', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        body = json.loads(resp.content)
+        self.assertEqual(body['drugs'], {
+            str(self.drug.id): {'name': 'Drug1', 'code': 'drug1', 'description': 'drug1'},
+            str(self.other_drug.id): {'name': 'Drug2', 'code': 'drug2', 'description': 'drug2'},
+        })
+
+        default = json.loads(self.client.get(self.url, **self.headers).content)
+        self.assertEqual(len(body['results']), len(default['results']))
+        for side_loaded, embedded in zip(body['results'], default['results']):
+            drug = body['drugs'][str(side_loaded.pop('drug_id'))]
+            self.assertEqual(dict(side_loaded, drug=drug), embedded)
+
+    def test_default_shape_unchanged(self):
+        resp = self.client.get(self.url, **self.headers)
+        self.assertNotIn('drugs', resp.data)
+        self.assertEqual(set(resp.data['results'][0]), {'rut', 'dose', 'date', 'drug'})
+
+    def test_paginated(self):
+        resp = self.client.get(self.url + '?include=drugs&page_size=2', **self.headers)
+        self.assertEqual(list(resp.data['drugs']), [str(self.drug.id)])
+        self.assertIn('include=drugs', resp.data['next'])
+
+        resp = self.client.get(resp.data['next'], **self.headers)
+        self.assertEqual(len(resp.data['results']), 2)
+        self.assertIn('drugs', resp.data)
+
+    def test_unknown_include(self):
+        resp = self.client.get(self.url + '?include=drugs,patients', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('include', resp.data)
+
+    def test_queries(self):
+        self.client.get(self.url + '?include=drugs', **self.headers)
+        with self.assertNumQueries(1):
+            self.client.get(self.url + '?include=drugs', **self.headers)
+
+
+class TestVaccinationSparseFieldsets(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.other_drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        Vaccination.objects.bulk_create(
+            [Vaccination(rut=self.valid_rut, dose='0.20', drug=drug) for drug in [self.drug, self.other_drug] * 3]
+        )
+        self.url = reverse('vaccinations:list_create')
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        select = [query['sql'] for query in queries if 'vaccinations_vaccination' in query['sql']][-1]
+        return resp.data, select
+
+    def test_list(self):
+        full = self.client.get(self.url, **self.headers).data['results']
+        data, select = self.get(self.url + '?fields=date,rut')
+        self.assertEqual(data['results'], [{'rut': vaccination['rut'], 'date': vaccination['date']}
+                                           for vaccination in full])
+        self.assertEqual(list(data['results'][0]), ['rut', 'date'])
+        self.assertNotIn('"dose"', select)
+        self.assertNotIn('drugs_drug', select)
+
+    def test_list_nested(self):
+        full = self.client.get(self.url, **self.headers).data['results']
+        data, select = self.get(self.url + '?fields=dose,drug.code')
+        self.assertEqual(data['results'], [{'dose': vaccination['dose'], 'drug': {'code': vaccination['drug']['code']}}
+                                           for vaccination in full])
+        self.assertIn('"drugs_drug"."code"', select)
+        self.assertNotIn('"drugs_drug"."description"', select)
+        self.assertNotIn('"rut_number"', select)
+
+        data, _ = self.get(self.url + '?fields=drug')
+        self.assertEqual(data['results'], [{'drug': vaccination['drug']} for vaccination in full])
+
+    def test_list_paginated(self):
+        data, _ = self.get(self.url + '?fields=rut&page_size=3')
+        self.assertEqual(len(data['results']), 3)
+        self.assertIn('fields=rut', data['next'])
+        data, _ = self.get(data['next'])
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(set(data['results'][0]), {'rut'})
+
+    def test_side_loaded(self):
+        data, select = self.get(self.url + '?include=drugs&fields=dose,drug.name')
+        self.assertEqual(set(data['results'][0]), {'dose', 'drug_id'})
+        self.assertEqual(data['drugs'], {str(self.drug.id): {'name': 'Drug1'},
+                                         str(self.other_drug.id): {'name': 'Drug2'}})
+        self.assertNotIn('drugs_drug', select)
+
+    def test_retrieve(self):
+        url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id})
+        data, select = self.get(url + '?fields=rut,drug.name')
+        self.assertEqual(data, {'rut': self.vaccination.rut, 'drug': {'name': 'Drug1'}})
+        self.assertNotIn('"dose"', select)
+        self.assertNotIn('"drugs_drug"."description"', select)
+
+    def test_unknown_field(self):
+        for fields in ('rut,patient', 'drug.price', 'rut.number'):
+            resp = self.client.get(self.url + '?fields=' + fields, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', resp.data)
+
+    def test_writes_ignore_fields(self):
+        url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id})
+        resp = self.client.patch(url + '?fields=rut', {'dose': '0.30'}, content_type=self.content_type,
+                                 **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(resp.data), {'rut', 'dose', 'date', 'drug'})
+
+
+class TestVaccinationBatchRetrieve(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.others = [Vaccination.objects.create(rut=self.valid_rut, dose=dose, drug=self.drug)
+                       for dose in ('0.20', '0.30', '0.40')]
+        self.url = reverse('vaccinations:list_create')
+
+    def get(self, query):
+        return self.client.get(self.url + query, **self.headers)
+
+    def test_order_and_missing(self):
+        ids = [self.others[2].id, self.vaccination.id, 999999, self.others[0].id]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.get('?ids=' + ','.join(map(str, ids)))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([vaccination['dose'] for vaccination in resp.data['results']], ['0.40', '0.15', '0.20'])
+        self.assertEqual(resp.data['missing'], [999999])
+        self.assertEqual(len([query for query in queries if 'vaccinations_vaccination' in query['sql']]), 1)
+
+    def test_duplicates(self):
+        resp = self.get(f'?ids={self.vaccination.id},{self.vaccination.id}')
+        self.assertEqual(len(resp.data['results']), 1)
+
+    def test_filters_apply(self):
+        resp = self.get(f'?ids={self.vaccination.id}&rut=1-9')
+        self.assertEqual(resp.data, {'results': [], 'missing': [self.vaccination.id]})
+
+    def test_fields_and_side_loaded(self):
+        resp = self.get(f'?ids={self.vaccination.id}&fields=dose')
+        self.assertEqual(resp.data['results'], [{'dose': '0.15'}])
+
+        resp = self.get(f'?ids={self.vaccination.id}&include=drugs&fields=dose,drug.code')
+        self.assertEqual(resp.data['results'], [{'dose': '0.15', 'drug_id': self.drug.id}])
+        self.assertEqual(resp.data['drugs'], {str(self.drug.id): {'code': 'drug1'}})
+
+    def test_invalid(self):
+        for ids in ('1,one', '0', '-1', '1,' + '9' * 20, '2147483648'):
+            resp = self.get('?ids=' + ids)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ids', resp.data)
+
+    @override_settings(BATCH_RETRIEVE_MAX_KEYS=3)
+    def test_too_many(self):
+        self.assertEqual(self.get('?ids=1,2,3,3').status_code, status.HTTP_200_OK)
+        resp = self.get('?ids=1,2,3,4')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', resp.data)
+
+
+class TestVaccinationIdempotency(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('vaccinations:list_create')
+        self.data = {'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id}
+
+    def post(self, data, key, url=None):
+        return self.client.post(url or self.url, data, content_type=self.content_type, HTTP_IDEMPOTENCY_KEY=key,
+                                **self.headers)
+
+    def test_replay(self):
+        first = self.post(self.data, 'visit-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        with CaptureQueriesContext(connection) as queries:
+            replay = self.post(self.data, 'visit-1')
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(replay.content), json.loads(first.content))
+        self.assertFalse([query for query in queries if 'vaccinations_vaccination' in query['sql']])
+        self.assertEqual(Vaccination.objects.count(), 2)
+
+        self.assertEqual(self.post(self.data, 'visit-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Vaccination.objects.count(), 3)
+
+    def test_keys_are_per_user(self):
+        self.post(self.data, 'visit-1')
+        token = RefreshToken.for_user(User.objects.create(username='other')).access_token
+        resp = self.client.post(self.url, self.data, content_type=self.content_type, HTTP_IDEMPOTENCY_KEY='visit-1',
+                                HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+        self.assertEqual(Vaccination.objects.count(), 3)
+
+    def test_validation_error_replayed(self):
+        data = dict(self.data, rut=self.invalid_rut)
+        first = self.post(data, 'visit-1')
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        replay = self.post(data, 'visit-1')
+        self.assertEqual(replay.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(replay.content), json.loads(first.content))
+
+    def test_different_request(self):
+        self.post(self.data, 'visit-1')
+        resp = self.post(dict(self.data, dose='0.60'), 'visit-1')
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Vaccination.objects.count(), 2)
+
+    def in_progress(self, key, locked_until):
+        # Claims the key the way the first request would, without a response.
+        self.post(self.data, key)
+        IdempotencyKey.objects.filter(key=key).update(status_code=None, response=None, locked_until=locked_until)
+
+    def test_in_progress(self):
+        self.in_progress('visit-1', timezone.now() + timedelta(minutes=1))
+        resp = self.post(self.data, 'visit-1')
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Vaccination.objects.count(), 2)
+
+        resp = self.post(dict(self.data, dose='0.60'), 'visit-1')
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_lease_expired(self):
+        # The first request died without storing its response: a retry after
+        # its lease runs the request again and then gets replayed.
+        self.in_progress('visit-1', timezone.now())
+        resp = self.post(self.data, 'visit-1')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+        self.assertEqual(Vaccination.objects.count(), 3)
+        self.assertEqual(self.post(self.data, 'visit-1')['Idempotent-Replayed'], 'true')
+
+    def test_expired(self):
+        self.post(self.data, 'visit-1')
+        IdempotencyKey.objects.update(expires=timezone.now())
+        resp = self.post(self.data, 'visit-1')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', resp)
+        self.assertEqual(Vaccination.objects.count(), 3)
+
+    def test_invalid_key(self):
+        resp = self.post(self.data, 'k' * 256)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Idempotency-Key', resp.data)
+
+    def test_bulk_create(self):
+        url = reverse('vaccinations:bulk_create')
+        records = [self.data, self.data]
+        self.assertEqual(self.post(records, 'batch-1', url).data['created'], 2)
+        replay = self.post(records, 'batch-1', url)
+        self.assertEqual(replay.data, {'created': 2, 'errors': []})
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Vaccination.objects.count(), 3)
+
+
+class TestVaccinationGroupCommit(TransactionTestCase):
+
+    def setUp(self):
+        token = RefreshToken.for_user(User.objects.create(username='user_test')).access_token
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        self.drug = Drug.objects.create(name='Drug1', code='drug1', description='drug1')
+
+    @override_settings(VACCINATION_GROUP_COMMIT=True)
+    def test_post(self):
+        batches = metrics.group_commit_rows.get_count(('vaccinations',))
+        resp = self.client.post(reverse('vaccinations:list_create'),
+                                {'rut': '115417479', 'dose': '0.50', 'drug_id': self.drug.id},
+                                content_type='application/json', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['rut'], '11.541.747-9')
+        self.assertEqual(resp.data['drug']['code'], 'drug1')
+        self.assertEqual(metrics.group_commit_rows.get_count(('vaccinations',)), batches + 1)
+        self.assertEqual(Vaccination.objects.count(), 1)
+        self.assertEqual(VaccinationDailyStat.objects.get().count, 1)
+
+    def test_ingest_each(self):
+        vaccinations = [Vaccination(rut='115417479', dose='0.50', drug=self.drug),
+                        Vaccination(rut_number=None, rut_dv='9', dose='0.50', drug=self.drug),
+                        Vaccination(rut='115417479', dose='0.20', drug=self.drug)]
+        results = Vaccination.objects.ingest_each(vaccinations)
+        self.assertIs(results[0], vaccinations[0])
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertIs(results[2], vaccinations[2])
+        self.assertEqual(sorted(Vaccination.objects.values_list('dose', flat=True)), [Decimal('0.20'), Decimal('0.50')])
+        self.assertEqual(VaccinationDailyStat.objects.get().count, 2)
+
+
+class TestVaccinationChangeFeed(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('vaccinations:changes')
+
+    def get(self, cursor=None, **params):
+        if cursor is not None:
+            params['since'] = cursor
+        resp = self.client.get(self.url, params, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data
+
+    def test_full_sync(self):
+        data = self.get()
+        self.assertEqual(data['changes'], [{
+            'id': self.vaccination.id, 'deleted': False,
+            'data': VaccinationSerializer(self.vaccination).data,
+        }])
+        self.assertFalse(data['more'])
+        self.assertEqual(self.get(data['cursor']), {'changes': [], 'cursor': data['cursor'], 'more': False})
+
+    def test_delta_sync(self):
+        cursor = self.get()['cursor']
+        created = Vaccination.objects.create(rut=self.valid_rut, dose='0.20', drug=self.drug)
+        self.vaccination.dose = Decimal('0.30')
+        self.vaccination.save()
+        created_id = created.id
+        created.delete()
+
+        data = self.get(cursor)
+        self.assertEqual([(change['id'], change['deleted']) for change in data['changes']],
+                         [(self.vaccination.id, False), (created_id, True)])
+        self.assertEqual(data['changes'][0]['data']['dose'], '0.30')
+        self.assertIsNone(data['changes'][1]['data'])
+
+    def test_delete_through_api(self):
+        cursor = self.get()['cursor']
+        resp = self.client.delete(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+                                  **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get(cursor)['changes'], [{'id': self.vaccination.id, 'deleted': True, 'data': None}])
+
+    def test_pages(self):
+        cursor = self.get()['cursor']
+        Vaccination.objects.bulk_ingest([Vaccination(rut=self.valid_rut, dose='0.20', drug=self.drug)
+                                         for _ in range(5)])
+        ids = []
+        more = True
+        while more:
+            data = self.get(cursor, page_size=2)
+            self.assertLessEqual(len(data['changes']), 2)
+            ids.extend(change['id'] for change in data['changes'])
+            cursor, more = data['cursor'], data['more']
+        self.assertEqual(ids, list(Vaccination.objects.exclude(id=self.vaccination.id).order_by('id')
+                                   .values_list('id', flat=True)))
+
+    def test_stops_at_committed_change_seq(self):
+        # A row stamped past the counter belongs to a transaction that has not
+        # committed yet, and is listed once the counter reaches it.
+        cursor = self.get()['cursor']
+        created = Vaccination.objects.create(rut=self.valid_rut, dose='0.20', drug=self.drug)
+        Vaccination.objects.filter(id=created.id).update(change_seq=created.change_seq + 1)
+        self.assertEqual(self.get(cursor)['changes'], [])
+        next_change_seq(Vaccination)
+        self.assertEqual([change['id'] for change in self.get(cursor)['changes']], [created.id])
+
+    def test_change_seq_order(self):
+        first = Vaccination.objects.create(rut=self.valid_rut, dose='0.20', drug=self.drug)
+        second = Vaccination.objects.create(rut=self.valid_rut, dose='0.20', drug=self.drug)
+        self.assertEqual(second.change_seq, first.change_seq + 1)
+        self.assertEqual(committed_change_seq(Vaccination), second.change_seq)
+
+    def test_change_seq_per_model(self):
+        # Drug writes take numbers from their own counter, without waiting for
+        # vaccination writes.
+        vaccination_seq = committed_change_seq(Vaccination)
+        drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        self.assertEqual(drug.change_seq, committed_change_seq(Drug))
+        self.assertEqual(committed_change_seq(Vaccination), vaccination_seq)
+        created = Vaccination.objects.create(rut=self.valid_rut, dose='0.20', drug=drug)
+        self.assertEqual(created.change_seq, vaccination_seq + 1)
+
+    def test_invalid_cursor(self):
+        for since in ('abc', '1', '-1.0', '99999999999999999999.1', '1.99999999999999999999', '1.2147483648'):
+            resp = self.client.get(self.url, {'since': since}, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('since', resp.data)
+        resp = self.client.get(self.url, {'since': f'{2 ** 63 - 1}.2147483647'}, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+
+class TestVaccinationQueryBudget(VaccinationSetUp):
+    """
+    Pins the number of queries per endpoint once the request user and the drug
+    catalog are cached, which is the steady state of a worker. None of them may
+    grow with the number of rows returned.
+    """
+
+    def setUp(self):
+        super().setUp()
+        resp = self.client.get(reverse('drugs:list_create'), content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def create_vaccinations(self, count):
+        drugs = [self.drug] + [Drug.objects.create(name=f'Drug{i}', code=f'budget{i}', description='') for i in
+                               range(3)]
+        Vaccination.objects.bulk_create(
+            [Vaccination(rut=self.valid_rut, dose='0.50', drug=drugs[i % len(drugs)]) for i in range(count - 1)],
+            batch_size=1000
+        )
+
+    def assertListQueries(self, page_size, expected_rows):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('vaccinations:list_create') + f'?page_size={page_size}',
+                                   content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), expected_rows)
+
+    def test_list_1(self):
+        self.assertListQueries(100, 1)
+
+    def test_list_100(self):
+        self.create_vaccinations(100)
+        self.assertListQueries(100, 100)
+
+    def test_list_10k(self):
+        self.create_vaccinations(10000)
+        self.assertListQueries(1000, 1000)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+                                   content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['drug']['code'], self.drug.code)
+
+    def test_create(self):
+        new_vaccination_data = {
+            'rut': self.valid_rut,
+            'dose': '0.50',
+            'drug_id': self.drug.id
+        }
+        # change counter update and read, INSERT, daily rollup
+        with self.assertNumQueries(4):
+            resp = self.client.post(reverse('vaccinations:list_create'), new_vaccination_data,
+                                    content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['drug']['code'], self.drug.code)
+
+    def test_update(self):
+        vaccination_update_data = {
+            'rut': self.valid_rut,
+            'dose': '0.50',
+            'drug_id': self.drug.id
+        }
+        # row, change counter update and read, UPDATE, daily rollup
+        with self.assertNumQueries(5):
+            resp = self.client.put(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+                                   vaccination_update_data, content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['drug']['code'], self.drug.code)
+
+
+class TestVaccinationBulkCreateView(VaccinationSetUp):
+
+    def test_post(self):
+        vaccination_count = Vaccination.objects.count()
+        records = [{'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id} for _ in range(1200)]
+        records[3]['rut'] = self.invalid_rut
+        records[7]['drug_id'] = 1000
+
+        # user, drug catalog, unknown drug id, change counter update and read, nine INSERTs of up to 140 rows,
+        # daily rollup
+        with self.settings(VACCINATION_BULK_BATCH_SIZE=140), self.assertNumQueries(15):
+            resp = self.client.post(reverse('vaccinations:bulk_create'), json.dumps(records),
+                                    content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['created'], 1198)
+        self.assertEqual([error['index'] for error in resp.data['errors']], [3, 7])
+        self.assertTrue('rut' in resp.data['errors'][0]['errors'])
+        self.assertTrue('drug_id' in resp.data['errors'][1]['errors'])
+        self.assertEqual(vaccination_count + 1198, Vaccination.objects.count())
+
+    def test_post_out_of_range_drug_id(self):
+        record = json.dumps({'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id})
+        body = '[%s, %s, %s]' % (record, record.replace(str(self.drug.id), '1e400'),
+                                 record.replace(str(self.drug.id), str(10 ** 30)))
+        resp = self.client.post(reverse('vaccinations:bulk_create'), body, content_type=self.content_type,
+                                **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['created'], 1)
+        self.assertEqual([error['index'] for error in resp.data['errors']], [1, 2])
+        self.assertTrue(all('drug_id' in error['errors'] for error in resp.data['errors']))
+
+    def test_post_non_integer_drug_id(self):
+        for drug_id in [True, 1.9, self.drug.id + 0.5]:
+            resp = self.client.post(reverse('vaccinations:bulk_create'),
+                                    [{'rut': self.valid_rut, 'dose': '0.50', 'drug_id': drug_id}],
+                                    content_type=self.content_type, **self.headers)
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('drug_id', resp.data['errors'][0]['errors'])
+
+    def test_post_ndjson(self):
+        vaccination_count = Vaccination.objects.count()
+        body = '\n'.join(json.dumps({'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id})
+                         for _ in range(3))
+
+        resp = self.client.post(reverse('vaccinations:bulk_create'), body + '\n',
+                                content_type='application/x-ndjson', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['created'], 3)
+        self.assertEqual(vaccination_count + 3, Vaccination.objects.count())
+
+        resp = self.client.post(reverse('vaccinations:bulk_create'), body + '\n{"rut"',
+                                content_type='application/x-ndjson', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(vaccination_count + 3, Vaccination.objects.count())
+
+    def test_post_invalid(self):
+        vaccination_count = Vaccination.objects.count()
+
+        resp = self.client.post(reverse('vaccinations:bulk_create'), json.dumps([{'rut': self.invalid_rut}]),
+                                content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['created'], 0)
+
+        resp = self.client.post(reverse('vaccinations:bulk_create'), json.dumps({'rut': self.valid_rut}),
+                                content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(VACCINATION_BULK_MAX_RECORDS=2):
+            records = [{'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id} for _ in range(3)]
+            resp = self.client.post(reverse('vaccinations:bulk_create'), json.dumps(records),
+                                    content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(vaccination_count, Vaccination.objects.count())
+
+
+class TestVaccinationExportView(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.other_drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        Vaccination.objects.bulk_create(
+            [Vaccination(rut=self.valid_rut, dose='0.50', drug=self.other_drug) for _ in range(4)]
+        )
+
+    def export(self, query=''):
+        resp = self.client.get(reverse('vaccinations:export') + query, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_get_ndjson(self):
+        with self.settings(VACCINATION_EXPORT_CHUNK_SIZE=2):
+            rows = [json.loads(line) for line in self.export().splitlines()]
+
+        self.assertEqual(len(rows), Vaccination.objects.count())
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+        self.assertEqual(rows[0]['rut'], self.vaccination.rut)
+        self.assertEqual(rows[0]['dose'], '0.15')
+        self.assertEqual(rows[0]['drug_code'], self.drug.code)
+        self.assertEqual(rows[1]['drug_name'], self.other_drug.name)
+
+    def test_get_csv(self):
+        lines = self.export('?format=csv').splitlines()
+
+        self.assertEqual(lines[0], 'id,rut,dose,date,drug_id,drug_name,drug_code')
+        self.assertEqual(len(lines), Vaccination.objects.count() + 1)
+
+    def test_get_filtered(self):
+        rows = self.export(f'?drug={self.other_drug.id}').splitlines()
+        self.assertEqual(len(rows), 4)
+
+        rows = self.export('?date_from=2000-01-01&date_to=2000-12-31').splitlines()
+        self.assertEqual(len(rows), 0)
+
+        today = self.vaccination.date.date().isoformat()
+        rows = self.export(f'?date_from={today}&date_to={today}').splitlines()
+        self.assertEqual(len(rows), Vaccination.objects.count())
+
+        resp = self.client.get(reverse('vaccinations:export') + '?date_from=yesterday', **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        resp = self.client.get(reverse('vaccinations:export'))
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestVaccinationListFilters(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.other_rut = '123456785'
+        self.other_drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+        Vaccination.objects.create(rut=self.other_rut, dose='0.50', drug=self.other_drug)
+        Vaccination.objects.create(rut=self.valid_rut, dose='0.50', drug=self.other_drug)
+
+    def get_list(self, query):
+        resp = self.client.get(reverse('vaccinations:list_create') + query, content_type=self.content_type,
+                               **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.data['results']
+
+    def test_get_by_rut(self):
+        for rut in (self.valid_rut, '11.541.747-9', '11541747-9'):
+            self.assertEqual(len(self.get_list(f'?rut={rut}')), 2)
+        self.assertEqual(len(self.get_list('?rut=12.345.678-5')), 1)
+
+        resp = self.client.get(reverse('vaccinations:list_create') + f'?rut={self.invalid_rut}',
+                               content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue('rut' in resp.data)
+
+    def test_get_by_drug_and_date(self):
+        self.assertEqual(len(self.get_list(f'?drug={self.other_drug.id}')), 2)
+        self.assertEqual(len(self.get_list(f'?drug={self.other_drug.id}&rut={self.other_rut}')), 1)
+        self.assertEqual(len(self.get_list('?date_to=2000-01-01')), 0)
+
+    def test_get_by_invalid_drug(self):
+        for url in (reverse('vaccinations:list_create'), reverse('vaccinations:stats'),
+                    reverse('vaccinations:export')):
+            for drug in ('abc', '0', '-1', '2147483648', str(10 ** 30)):
+                resp = self.client.get(f'{url}?drug={drug}', **self.headers)
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(resp.data['drug'], ['Invalid drug id'])
+
+    def test_post_normalizes_rut(self):
+        new_vaccination_data = {
+            'rut': '11.541.747-9',
+            'dose': '0.50',
+            'drug_id': self.drug.id
+        }
+        resp = self.client.post(reverse('vaccinations:list_create'), new_vaccination_data,
+                                content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data['rut'], '11.541.747-9')
+        self.assertEqual(len(self.get_list('?rut=11541747-9')), 3)
+
+
+class TestRut(TestCase):
+
+    def test_parse_rut(self):
+        for rut in ('115417479', '11541747-9', '11.541.747-9', ' 011541747-9 '):
+            self.assertEqual(parse_rut(rut), (11541747, '9'))
+        self.assertEqual(parse_rut('10.000.013-k'), (10000013, 'K'))
+        self.assertEqual(parse_rut('1-9'), (1, '9'))
+
+        for rut in ('11541747k', '11.541.7479', '1154.1747-9', 'abc', '', '0-0', None):
+            with self.assertRaises(ValueError):
+                parse_rut(rut)
+
+    def test_format_rut(self):
+        self.assertEqual(format_rut(11541747, '9'), '11.541.747-9')
+        self.assertEqual(format_rut(10000013, 'K'), '10.000.013-K')
+        self.assertEqual(format_rut(1, '9'), '1-9')
+        self.assertEqual(normalize_rut('11.541.747-9'), '115417479')
+
+    def test_vaccination_rut(self):
+        vaccination = Vaccination(rut='11.541.747-9')
+        self.assertEqual((vaccination.rut_number, vaccination.rut_dv), (11541747, '9'))
+        self.assertEqual(vaccination.rut, '11.541.747-9')
+
+
+class TestRutMigration(TransactionTestCase):
+    before = [('vaccinations', '0003_vaccination_rut_drug_date_idx'), ('drugs', '0003_drug_change_seq')]
+    after = [('vaccinations', '0004_vaccination_rut_number')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(executor.loader.graph.leaf_nodes()))
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        drug = apps.get_model('drugs', 'Drug').objects.create(name='Drug1', code='drug1', description='drug1')
+        self.Vaccination = apps.get_model('vaccinations', 'Vaccination')
+        self.valid = self.Vaccination.objects.create(rut='115417479', dose='0.15', drug=drug)
+        self.invalid = self.Vaccination.objects.create(rut='0-0', dose='0.15', drug=drug)
+
+    def test_invalid_rut_stops_before_changes(self):
+        with self.assertRaisesMessage(ValueError, f"{self.invalid.id} ('0-0')"):
+            MigrationExecutor(connection).migrate(self.after)
+        with connection.cursor() as cursor:
+            columns = [column.name for column in
+                       connection.introspection.get_table_description(cursor, 'vaccinations_vaccination')]
+        self.assertNotIn('rut_number', columns)
+
+        self.invalid.delete()
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Vaccination = executor.loader.project_state(self.after).apps.get_model('vaccinations', 'Vaccination')
+        self.assertEqual(Vaccination.objects.values_list('rut_number', 'rut_dv').get(), (11541747, '9'))
+
+
+class TestVaccinationDailyStats(VaccinationSetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.other_drug = Drug.objects.create(name='Drug2', code='drug2', description='drug2')
+
+    def get_stats(self, query=''):
+        resp = self.client.get(reverse('vaccinations:stats') + query, content_type=self.content_type, **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return {stat['drug_id']: (stat['count'], stat['total_dose']) for stat in resp.data}
+
+    def assertStatsRebuildEqual(self):
+        stats = self.get_stats()
+        call_command('rebuild_vaccination_stats', stdout=io.StringIO())
+        self.assertEqual(self.get_stats(), stats)
+
+    def test_create_update_delete(self):
+        self.assertEqual(self.get_stats(), {self.drug.id: (1, '0.15')})
+
+        self.client.post(reverse('vaccinations:list_create'),
+                         {'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.other_drug.id},
+                         content_type=self.content_type, **self.headers)
+        self.assertEqual(self.get_stats(), {self.drug.id: (1, '0.15'), self.other_drug.id: (1, '0.50')})
+
+        self.client.patch(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+                          {'dose': '0.25', 'drug_id': self.other_drug.id}, content_type=self.content_type,
+                          **self.headers)
+        self.assertEqual(self.get_stats(), {self.other_drug.id: (2, '0.75')})
+
+        self.client.delete(reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id}),
+                           content_type=self.content_type, **self.headers)
+        self.assertEqual(self.get_stats(), {self.other_drug.id: (1, '0.50')})
+        self.assertStatsRebuildEqual()
+
+    def test_bulk_create(self):
+        records = [{'rut': self.valid_rut, 'dose': '0.20', 'drug_id': drug.id}
+                   for drug in (self.drug, self.other_drug, self.other_drug)]
+        self.client.post(reverse('vaccinations:bulk_create'), json.dumps(records), content_type=self.content_type,
+                         **self.headers)
+        self.assertEqual(self.get_stats(), {self.drug.id: (2, '0.35'), self.other_drug.id: (2, '0.40')})
+        self.assertStatsRebuildEqual()
+
+    def test_filters(self):
+        today = self.vaccination.date.date().isoformat()
+        self.assertEqual(len(self.get_stats(f'?date_from={today}&date_to={today}&drug={self.drug.id}')), 1)
+        self.assertEqual(len(self.get_stats('?date_to=2000-01-01')), 0)
+
+        resp = self.client.get(reverse('vaccinations:stats') + '?date_from=today', content_type=self.content_type,
+                               **self.headers)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestVaccinationConditionalGet(VaccinationSetUp):
+
+    def get(self, url, **headers):
+        return self.client.get(url, content_type=self.content_type, **self.headers, **headers)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'portal_cache'}})
+    def test_list_database_cache(self):
+        # Both version stamps are read with one query, as on App Engine.
+        call_command('createcachetable', verbosity=0)
+        url = reverse('vaccinations:list_create')
+        etag = self.get(url)['ETag']
+        with self.assertNumQueries(1):
+            resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list(self):
+        url = reverse('vaccinations:list_create')
+        resp = self.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp['ETag']
+
+        with self.assertNumQueries(0):
+            resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp['ETag'], etag)
+
+        resp = self.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        resp = self.get(url + f'?drug={self.drug.id}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        self.client.post(url, {'rut': self.valid_rut, 'dose': '0.50', 'drug_id': self.drug.id},
+                         content_type=self.content_type, **self.headers)
+        resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 2)
+        etag = resp['ETag']
+
+        self.drug.name = 'Drug1 renamed'
+        self.drug.save()
+        resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    @override_settings(DRUG_CACHE_VERSION_TTL=60)
+    def test_list_side_loaded(self):
+        url = reverse('vaccinations:list_create') + '?include=drugs'
+        etag = self.get(url)['ETag']
+
+        # Another process renames the drug: the side-loaded drugs are served
+        # from this process's cache until the TTL passes, under the same ETag.
+        Drug.objects.filter(id=self.drug.id).update(name='Drug1 renamed')
+        bump_version(drug_cache.version_name)
+        resp = self.get(url)
+        self.assertEqual((resp.data['drugs'][str(self.drug.id)]['name'], resp['ETag']), ('Drug1', etag))
+
+        drug_cache._checked -= 60
+        resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['drugs'][str(self.drug.id)]['name'], 'Drug1 renamed')
+
+    def test_retrieve(self):
+        url = reverse('vaccinations:retrieve_update_delete', kwargs={'id': self.vaccination.id})
+        resp = self.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp['ETag']
+
+        with self.assertNumQueries(1):
+            resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {'dose': '0.50'}, content_type=self.content_type, **self.headers)
+        resp = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['dose'], '0.50')
+
+        resp = self.get(reverse('vaccinations:retrieve_update_delete', kwargs={'id': 1000}), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
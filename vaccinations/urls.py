@@ -1,9 +1,15 @@
 from django.urls import path
 
-from vaccinations.views import vaccination_list_create_view, vaccination_retrieve_update_delete_view
+from vaccinations.views import vaccination_bulk_create_view, vaccination_change_feed_view, \
+    vaccination_daily_stat_list_view, vaccination_export_view, vaccination_list_create_view, \
+    vaccination_retrieve_update_delete_view
 
 app_name = "vaccinations"
 urlpatterns = [
     path('', vaccination_list_create_view, name='list_create'),
     path('/<int:id>', vaccination_retrieve_update_delete_view, name='retrieve_update_delete'),
+    path('/bulk', vaccination_bulk_create_view, name='bulk_create'),
+    path('/export', vaccination_export_view, name='export'),
+    path('/changes', vaccination_change_feed_view, name='changes'),
+    path('/stats', vaccination_daily_stat_list_view, name='stats'),
 ]
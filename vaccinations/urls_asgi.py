@@ -0,0 +1,16 @@
+from django.urls import path
+
+from portal.asgi_views import async_read_view
+from vaccinations.views import vaccination_bulk_create_view, vaccination_change_feed_view, \
+    vaccination_daily_stat_list_view, vaccination_export_view, vaccination_list_create_view, \
+    vaccination_retrieve_update_delete_view
+
+app_name = "vaccinations"
+urlpatterns = [
+    path('', async_read_view(vaccination_list_create_view), name='list_create'),
+    path('/<int:id>', async_read_view(vaccination_retrieve_update_delete_view), name='retrieve_update_delete'),
+    path('/bulk', vaccination_bulk_create_view, name='bulk_create'),
+    path('/export', vaccination_export_view, name='export'),
+    path('/changes', async_read_view(vaccination_change_feed_view), name='changes'),
+    path('/stats', vaccination_daily_stat_list_view, name='stats'),
+]
@@ -1,27 +1,303 @@
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (
+    CreateAPIView, GenericAPIView, ListAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView,
+)
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from vaccinations.models import Vaccination
-from vaccinations.serializers import VaccinationSerializer
+from drugs.cache import drug_cache
+from portal.batch import BatchRetrieveMixin
+from portal.changes import ChangeFeedAPIView
+from portal.conditional import ConditionalGetMixin
+from portal.fieldsets import SparseFieldsetsMixin
+from portal.group_commit import GroupCommitter
+from portal.idempotency import IdempotentCreateMixin
+from portal.parsers import NDJSONParser
+from portal.replicas import ReplicaReadMixin
+from portal.timing import timed
+from portal.versions import get_version, get_version_time, get_versions
+from vaccinations.filters import VaccinationDailyStatFilterBackend, VaccinationFilterBackend
+from vaccinations.models import Vaccination, VaccinationDailyStat
+from vaccinations.pagination import VaccinationCursorPagination
+from vaccinations.renderers import CSVRenderer, NDJSONRenderer
+from vaccinations.representations import (
+    ROW_FIELDS, SIDE_LOADED_ROW_FIELDS, date_representer, represent_dose, represent_drug_map,
+    represent_side_loaded_vaccinations, represent_sparse_vaccinations, represent_vaccinations, sparse_row_fields,
+    vaccination_rows,
+)
+from vaccinations.rut import format_rut
+from vaccinations.serializers import VaccinationDailyStatSerializer, VaccinationSerializer
 
 
-class VaccinationListCreateAPIView(ListCreateAPIView):
+vaccination_committer = GroupCommitter('vaccinations', Vaccination.objects.ingest_each,
+                                       settings.VACCINATION_GROUP_COMMIT_MAX_ROWS,
+                                       settings.VACCINATION_GROUP_COMMIT_MAX_DELAY)
+
+
+class VaccinationListCreateAPIView(ReplicaReadMixin, IdempotentCreateMixin, ConditionalGetMixin, SparseFieldsetsMixin,
+                                   BatchRetrieveMixin, ListCreateAPIView):
     serializer_class = VaccinationSerializer
-    queryset = Vaccination.objects.all()
+    queryset = Vaccination.objects.select_related('drug')
+    filter_backends = [VaccinationFilterBackend]
+    pagination_class = VaccinationCursorPagination
+    include_query_param = 'include'
+    includes = ['drugs']
 
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self):
+        if 'drugs' in self.get_includes():
+            # The side-loaded drugs come from this process's drug cache, which
+            # may be up to DRUG_CACHE_VERSION_TTL behind the shared stamp.
+            versions = [get_version(Vaccination.version_name), drug_cache.version()]
+        else:
+            versions = get_versions(Vaccination.version_name, drug_cache.version_name)
+        return ':'.join(versions), max(get_version_time(version) for version in versions)
+
+    def list(self, request, *args, **kwargs):
+        # Read-only fast path: flat rows represented without serializers, with
+        # the same output as VaccinationSerializer.
+        if 'drugs' in self.get_includes():
+            return self.list_side_loaded()
+
+        selection = self.get_fields_selection()
+        fields = sparse_row_fields(selection) if selection is not None else ROW_FIELDS
+        rows, ids, paginated = self.get_rows(fields)
+        with timed('serialize'):
+            if selection is not None:
+                data = represent_sparse_vaccinations(rows, selection)
+            else:
+                data = represent_vaccinations(rows)
+        if ids is not None:
+            return self.get_batch_response(ids, {row.id: item for row, item in zip(rows, data)})
+        if paginated:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def list_side_loaded(self):
+        """
+        `?include=drugs`: vaccinations with `drug_id` only and every drug they
+        reference once, in a `drugs` map keyed by id. With `?fields=` the
+        `drug` selection applies to the drugs in the map.
+        """
+        selection = self.get_fields_selection()
+        if selection is not None:
+            fields = sparse_row_fields(selection, side_loaded=True)
+        else:
+            fields = SIDE_LOADED_ROW_FIELDS
+        rows, ids, paginated = self.get_rows(fields)
+        with timed('serialize'):
+            if selection is not None:
+                data = represent_sparse_vaccinations(rows, selection, side_loaded=True)
+            else:
+                data = represent_side_loaded_vaccinations(rows)
+            drugs = represent_drug_map({vaccination['drug_id'] for vaccination in data},
+                                       selection.get('drug') if selection is not None else None)
+        if ids is not None:
+            response = self.get_batch_response(ids, {row.id: item for row, item in zip(rows, data)})
+        elif paginated:
+            response = self.get_paginated_response(data)
+        else:
+            return Response({'results': data, 'drugs': drugs})
+        response.data['drugs'] = drugs
+        return response
+
+    def get_rows(self, fields):
+        """
+        Returns the filtered rows of `fields` to represent, the `?ids=` of a
+        batch retrieve (None otherwise) and whether the rows are a page. A batch
+        is read with one `IN` query and is not paginated.
+        """
+        rows = vaccination_rows(self.filter_queryset(self.get_queryset()), fields)
+        ids = self.get_batch_keys()
+        if ids is not None:
+            return list(rows.filter(id__in=ids)), ids, False
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return page, None, True
+        return rows, None, False
+
+    def perform_create(self, serializer):
+        # A batch is committed by whichever request leads it, so requests that
+        # run inside a transaction of their own write directly. So do requests
+        # served over ASGI: sync views all run on one thread there, so the
+        # leader would wait for followers that cannot arrive.
+        if settings.VACCINATION_GROUP_COMMIT and not transaction.get_connection().in_atomic_block \
+                and not isinstance(self.request._request, ASGIRequest):
+            serializer.instance = vaccination_committer.submit(Vaccination(**serializer.validated_data))
+        else:
+            super().perform_create(serializer)
+
+    def get_includes(self):
+        includes = {name for name in self.request.query_params.get(self.include_query_param, '').split(',') if name}
+        unknown = sorted(includes.difference(self.includes))
+        if unknown:
+            raise ValidationError({self.include_query_param: [
+                _("Unknown include: %s. Allowed: %s") % (', '.join(unknown), ', '.join(self.includes))
+            ]})
+        return includes
+
 
 vaccination_list_create_view = VaccinationListCreateAPIView.as_view()
 
 
-class VaccinationRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class VaccinationRetrieveUpdateDestroyAPIView(ReplicaReadMixin, ConditionalGetMixin, SparseFieldsetsMixin,
+                                              RetrieveUpdateDestroyAPIView):
     serializer_class = VaccinationSerializer
-    queryset = Vaccination.objects.all()
+    queryset = Vaccination.objects.select_related('drug')
     lookup_field = 'id'
     lookup_url_kwarg = 'id'
+    required_columns = ['id', 'modified']
 
     permission_classes = [IsAuthenticated]
 
+    _object = None
+
+    def get_object(self):
+        # The instance loaded for the validators is reused for the response body.
+        if self._object is None:
+            self._object = super().get_object()
+        return self._object
+
+    def get_validators(self):
+        vaccination = self.get_object()
+        drugs_version = get_version(drug_cache.version_name)
+        key = f'{vaccination.id}:{vaccination.modified.isoformat()}:{drugs_version}'
+        return key, max(vaccination.modified, get_version_time(drugs_version))
+
 
 vaccination_retrieve_update_delete_view = VaccinationRetrieveUpdateDestroyAPIView.as_view()
+
+
+class VaccinationBulkCreateAPIView(ReplicaReadMixin, IdempotentCreateMixin, CreateAPIView):
+    """
+    Creates up to `VACCINATION_BULK_MAX_RECORDS` vaccinations from a JSON array or
+    an NDJSON body.
+
+    Every record is validated by a single serializer instance against drugs resolved
+    in one pass, valid rows are inserted in batches inside one transaction and
+    invalid rows are reported by their index in the request.
+    """
+    serializer_class = VaccinationSerializer
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        records = request.data
+        if not isinstance(records, list) or not records:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [_("Expected a non-empty list of records")]})
+        if len(records) > settings.VACCINATION_BULK_MAX_RECORDS:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                _("Too many records. At most %d are allowed") % settings.VACCINATION_BULK_MAX_RECORDS
+            ]})
+
+        context = self.get_serializer_context()
+        context['drugs'] = self.get_drugs(records)
+        serializer = self.get_serializer_class()(context=context)
+
+        vaccinations = []
+        errors = []
+        for index, record in enumerate(records):
+            try:
+                validated_data = serializer.run_validation(record)
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+            else:
+                vaccinations.append(Vaccination(**validated_data))
+
+        if vaccinations:
+            Vaccination.objects.bulk_ingest(vaccinations, batch_size=settings.VACCINATION_BULK_BATCH_SIZE)
+
+        response_status = status.HTTP_201_CREATED if vaccinations else status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(vaccinations), 'errors': errors}, status=response_status)
+
+    @staticmethod
+    def get_drugs(records):
+        drug_ids = set()
+        for record in records:
+            try:
+                drug_ids.add(int(record['drug_id']))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                pass
+        return drug_cache.get_many(drug_ids)
+
+
+vaccination_bulk_create_view = VaccinationBulkCreateAPIView.as_view()
+
+
+class VaccinationExportAPIView(ReplicaReadMixin, GenericAPIView):
+    """
+    Streams every vaccination matching the filters as NDJSON (`?format=ndjson`,
+    the default) or CSV (`?format=csv`).
+
+    Rows are read in keyset chunks of `VACCINATION_EXPORT_CHUNK_SIZE` ordered by
+    id, so worker memory stays flat whatever the size of the table.
+    """
+    queryset = Vaccination.objects.all()
+    filter_backends = [VaccinationFilterBackend]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    columns = ['id', 'rut', 'dose', 'date', 'drug_id', 'drug_name', 'drug_code']
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # The rows are read after the view returns, bind the request's database now.
+        queryset = queryset.using(queryset.db)
+        renderer = request.accepted_renderer
+
+        response = StreamingHttpResponse(renderer.stream(self.columns, self.iterate_rows(queryset)),
+                                         content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="vaccinations.{renderer.format}"'
+        return response
+
+    def iterate_rows(self, queryset):
+        queryset = queryset.order_by('id').values_list('id', 'rut_number', 'rut_dv', 'dose', 'date', 'drug_id',
+                                                       'drug__name', 'drug__code')
+        chunk_size = settings.VACCINATION_EXPORT_CHUNK_SIZE
+        represent_date = date_representer()
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            for vaccination_id, rut_number, rut_dv, dose, date, drug_id, drug_name, drug_code in chunk:
+                yield (vaccination_id, format_rut(rut_number, rut_dv), represent_dose(dose), represent_date(date),
+                       drug_id, drug_name, drug_code)
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1][0]
+
+
+vaccination_export_view = VaccinationExportAPIView.as_view()
+
+
+class VaccinationChangeFeedAPIView(ChangeFeedAPIView):
+    serializer_class = VaccinationSerializer
+    queryset = Vaccination.objects.select_related('drug')
+
+    permission_classes = [IsAuthenticated]
+
+
+vaccination_change_feed_view = VaccinationChangeFeedAPIView.as_view()
+
+
+class VaccinationDailyStatListAPIView(ReplicaReadMixin, ListAPIView):
+    """
+    Vaccinations and total dose per drug and day, read from the daily rollups.
+    """
+    serializer_class = VaccinationDailyStatSerializer
+    queryset = VaccinationDailyStat.objects.filter(count__gt=0).order_by('day', 'drug_id')
+    filter_backends = [VaccinationDailyStatFilterBackend]
+    pagination_class = None
+
+    permission_classes = [IsAuthenticated]
+
+
+vaccination_daily_stat_list_view = VaccinationDailyStatListAPIView.as_view()